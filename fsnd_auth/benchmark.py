@@ -0,0 +1,159 @@
+'''
+benchmark.py
+    authenticated request throughput of the three apps using fsnd_auth,
+    with every request verified in full and with the verified-token cache
+
+    $ python benchmark.py --requests 2000 basic coffee capstone
+
+    Each app runs in its own process from its own directory (they all have an
+    app module), with its verifier pointed at a local TestIssuer, and is
+    driven through the Flask test client so the numbers are the app's own
+    cost without a network in between.
+
+    !!NOTE capstone reads its movies from DATABASE_URL (default
+    postgresql://localhost:5432/casting) and creates missing tables there;
+    coffee uses a scratch sqlite file
+'''
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+'''
+App
+    directory: where the app is run from, relative to the repository root
+    module: the module holding the Flask app and its auth verifier
+    url, permissions: the authenticated endpoint and what its token carries
+'''
+App = namedtuple('App', ['directory', 'module', 'url', 'permissions', 'environ'])
+
+APPS = {
+    'basic': App('BasicFlaskAuth', 'app', '/image', ('get_images',), {}),
+    'coffee': App('projects/03_coffee_shop_full_stack/starter_code/backend', 'src.api',
+                  '/drinks-detail', ('get:drinks-detail',), {}),
+    'capstone': App('projects/capstone/starter', 'app', '/movies', ('get:movies',), {
+        'AUTH0_DOMAIN': 'casting.test',
+        'ALGORITHMS': "['RS256']",
+        'API_AUDIENCE': 'Casting',
+        'DATABASE_URL': 'postgresql://localhost:5432/casting',
+    }),
+}
+
+MODES = (('full verification', False), ('token cache', True))
+
+
+def load(name):
+    '''imports the app and returns (flask app, its TokenVerifier)'''
+    import importlib
+    module = importlib.import_module(APPS[name].module)
+    if name == 'coffee':
+        from src.database.models import db_drop_and_create_all
+        # keep the project's database.db untouched
+        module.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(
+            tempfile.mkdtemp(), 'benchmark.db')
+        with module.app.app_context():
+            db_drop_and_create_all()
+        return module.app, module.verifier
+    if name == 'capstone':
+        import auth
+        from models import db
+        with module.app.app_context():
+            db.create_all()
+        return module.app, auth.verifier
+    return module.app, module.verifier
+
+
+def drive(app, url, token, requests, threads):
+    '''issues requests spread over threads, returning the elapsed seconds'''
+    headers = {'Authorization': 'Bearer ' + token}
+    statuses = set()
+
+    def run(count):
+        client = app.test_client()
+        for _ in range(count):
+            statuses.add(client.get(url, headers=headers).status_code)
+
+    workers = [threading.Thread(target=run, args=(requests // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    if statuses != {200}:
+        raise SystemExit('%s answered %s' % (url, sorted(statuses)))
+    return elapsed
+
+
+def worker(name, algorithm, requests, threads):
+    '''runs inside the app's directory and prints one JSON result per mode'''
+    sys.path.insert(0, os.getcwd())
+    from fsnd_auth.testing import TestIssuer
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        app, verifier = load(name)
+    app.debug = False
+    issuer = TestIssuer(algorithm, domain='bench.test', audience=verifier.settings.audience)
+    token = issuer.token(permissions=APPS[name].permissions)
+
+    results = []
+    for mode, cached in MODES:
+        issuer.configure(verifier, token_cache=cached)
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            drive(app, APPS[name].url, token, threads * 10, threads)
+            elapsed = drive(app, APPS[name].url, token, requests, threads)
+        results.append({
+            'app': name,
+            'mode': mode,
+            'requests': requests // threads * threads,
+            'seconds': elapsed,
+            'stats': verifier.stats()['tokens'],
+        })
+    for result in results:
+        print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Authenticated request throughput')
+    parser.add_argument('apps', nargs='*', default=sorted(APPS), help=', '.join(sorted(APPS)))
+    parser.add_argument('--algorithm', default='RS256', help='RS256 or HS256')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.algorithm, args.requests, args.threads)
+        return
+
+    unknown = set(args.apps) - set(APPS)
+    if unknown:
+        parser.error('unknown apps: ' + ', '.join(sorted(unknown)))
+
+    for name in args.apps:
+        app = APPS[name]
+        environ = dict(app.environ, **os.environ)
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', name, '--algorithm', args.algorithm,
+             '--requests', str(args.requests), '--threads', str(args.threads)],
+            cwd=os.path.join(ROOT, app.directory), env=environ, stdout=subprocess.PIPE)
+        if process.returncode:
+            print('%-9s failed (exit %d)' % (name, process.returncode))
+            continue
+        for line in process.stdout.decode().splitlines():
+            result = json.loads(line)
+            print('%-9s %-18s %8.0f req/s %8.1fus/req' % (
+                result['app'], result['mode'], result['requests'] / result['seconds'],
+                result['seconds'] / result['requests'] * 1e6))
+
+
+if __name__ == '__main__':
+    main()
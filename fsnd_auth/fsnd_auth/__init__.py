@@ -0,0 +1,14 @@
+'''
+fsnd_auth
+    Auth0 bearer token verification shared by the FSND Flask apps
+'''
+from .jwks import JWKSCache, JWKSUnavailable, StaticKeys, max_age
+from .token_cache import VerifiedToken, VerifiedTokenCache
+from .verifier import (AuthError, TokenVerifier, check_permissions, compile_permissions,
+                       get_token_auth_header, parse_algorithms)
+
+__all__ = [
+    'AuthError', 'JWKSCache', 'JWKSUnavailable', 'StaticKeys', 'TokenVerifier',
+    'VerifiedToken', 'VerifiedTokenCache', 'check_permissions', 'compile_permissions',
+    'get_token_auth_header', 'max_age', 'parse_algorithms'
+]
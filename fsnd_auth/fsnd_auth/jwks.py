@@ -0,0 +1,159 @@
+'''
+jwks.py
+    process-wide cache of an identity provider's JSON Web Key Set
+
+    EXAMPLE
+        jwks = JWKSCache(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+        rsa_key = jwks.get_key(unverified_header['kid'])
+
+    Keys are fetched once and kept for the max-age the provider sends in
+    Cache-Control (bounded by min_ttl and max_ttl, default_ttl without one).
+    Shortly before they expire a background thread refreshes them while
+    requests keep using the cached set, so verifying a token costs a
+    dictionary lookup plus the signature check.
+
+    A token signed with an unknown kid (the provider rotated its keys) makes
+    the cache refetch at once, but at most every min_refetch_interval seconds
+    so a stream of forged kids cannot hammer the provider. If the provider is
+    unreachable, the last good key set keeps being served.
+'''
+import json
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+
+class JWKSUnavailable(Exception):
+    '''raised when no key set has ever been fetched and the provider is unreachable'''
+    pass
+
+
+def max_age(cache_control):
+    '''max-age in seconds from a Cache-Control header, 0 for no-cache/no-store, or None'''
+    if not cache_control:
+        return None
+    if re.search(r'\bno-(cache|store)\b', cache_control):
+        return 0
+    match = re.search(r'\bmax-age\s*=\s*"?(\d+)', cache_control)
+    return int(match.group(1)) if match else None
+
+
+class StaticKeys(object):
+    '''
+    StaticKeys(keys)
+        a fixed {kid: key} mapping used in place of a JWKSCache, e.g. an
+        HS256 secret or the public JWKs of a local test issuer
+    '''
+    def __init__(self, keys):
+        self.keys = dict(keys)
+        self.fetches = 0
+
+    def get_key(self, kid):
+        return self.keys.get(kid)
+
+
+class JWKSCache(object):
+    '''
+    JWKSCache(url)
+        url: the provider's /.well-known/jwks.json
+        default_ttl: lifetime of a key set served without Cache-Control max-age
+        min_ttl / max_ttl: bounds applied to the provider's max-age
+        refresh_ahead: fraction of the lifetime after which a background refresh starts
+        min_refetch_interval: minimum seconds between fetches triggered by unknown kids
+    '''
+    def __init__(self, url, default_ttl=600, min_ttl=60, max_ttl=86400, refresh_ahead=0.8,
+                 min_refetch_interval=30, timeout=5, clock=time.monotonic):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.clock = clock
+        self.fetches = 0
+        self._keys = None
+        self._refresh_at = None
+        self._expires_at = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    def get_key(self, kid):
+        '''
+        get_key(kid)
+            the signing key with this kid as an RSA JWK dict, or None
+            raises JWKSUnavailable if the key set cannot be fetched at all
+        '''
+        now = self.clock()
+        if self._keys is None or now >= self._expires_at:
+            self._fetch(blocking=True)
+        elif now >= self._refresh_at:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._may_refetch():
+            self._fetch(blocking=True, forced=True)
+            key = self._keys.get(kid)
+        return key
+
+    def _may_refetch(self):
+        return self._last_attempt is None or \
+            self.clock() - self._last_attempt >= self.min_refetch_interval
+
+    def _load(self):
+        response = urlopen(self.url, timeout=self.timeout)
+        try:
+            jwks = json.loads(response.read())
+            cache_control = response.headers.get('Cache-Control')
+        finally:
+            response.close()
+        keys = {}
+        for key in jwks['keys']:
+            if key.get('kty') == 'RSA' and 'kid' in key:
+                keys[key['kid']] = {
+                    'kty': key['kty'],
+                    'kid': key['kid'],
+                    'use': key.get('use', 'sig'),
+                    'n': key['n'],
+                    'e': key['e']
+                }
+        ttl = max_age(cache_control)
+        ttl = self.default_ttl if ttl is None else min(max(ttl, self.min_ttl), self.max_ttl)
+        return keys, ttl
+
+    def _fetch(self, blocking, forced=False):
+        # one fetch at a time; callers that waited on the lock reuse its result
+        if not self._lock.acquire(blocking):
+            return
+        try:
+            now = self.clock()
+            fresh = self._keys is not None and now < self._refresh_at
+            if fresh and not forced:
+                return
+            if forced and not self._may_refetch():
+                return
+            self._last_attempt = now
+            try:
+                keys, ttl = self._load()
+            except Exception:
+                if self._keys is None:
+                    raise JWKSUnavailable(self.url)
+                # keep serving the last good keys, try again after min_refetch_interval
+                self._refresh_at = now + self.min_refetch_interval
+                self._expires_at = max(self._expires_at, self._refresh_at)
+                return
+            self.fetches += 1
+            # get_key reads these without the lock once _keys is set, so it goes last
+            self._refresh_at = now + ttl * self.refresh_ahead
+            self._expires_at = now + ttl
+            self._keys = keys
+        finally:
+            self._lock.release()
+
+    def _refresh_in_background(self):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self._fetch, args=(False,), daemon=True)
+        self._refresh_thread.start()
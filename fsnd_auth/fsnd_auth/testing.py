@@ -0,0 +1,148 @@
+'''
+testing.py
+    a local token issuer for tests and benchmarks
+
+    EXAMPLE
+        issuer = TestIssuer('RS256', domain='casting.test', audience='Casting')
+        issuer.configure(auth.verifier)
+        token = issuer.token(permissions=['get:movies'])
+        client.get('/movies', headers={'Authorization': 'Bearer ' + token})
+
+    RS256 issuers sign with a freshly generated RSA key (the 'testing' extra
+    installs rsa for that) and publish its public JWK, either directly through
+    StaticKeys or over HTTP with StubJWKSServer; HS256 issuers share a secret
+    with the verifier. Neither talks to Auth0.
+'''
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from jose import jwk, jwt
+
+from .jwks import JWKSCache, StaticKeys
+from .verifier import TokenVerifier
+
+
+class TestIssuer(object):
+    '''
+    TestIssuer(algorithm, domain, audience)
+        algorithm: 'RS256' or 'HS256'
+        kids: one signing key is made per kid; token() signs with the first
+        bits: RSA key size; small keys keep test setup fast
+    '''
+    __test__ = False
+
+    def __init__(self, algorithm='RS256', domain='fsnd.test', audience='fsnd',
+                 kids=('test-key',), bits=1024):
+        if algorithm not in ('RS256', 'HS256'):
+            raise ValueError('unsupported algorithm ' + algorithm)
+        self.algorithm = algorithm
+        self.domain = domain
+        self.audience = audience
+        self.kids = list(kids)
+        self.signing_keys = {}
+        self.public_keys = {}
+        for kid in self.kids:
+            self.signing_keys[kid], self.public_keys[kid] = self._new_key(kid, bits)
+
+    def _new_key(self, kid, bits):
+        if self.algorithm == 'HS256':
+            secret = secrets.token_urlsafe(32)
+            return secret, secret
+        import rsa
+        public, private = rsa.newkeys(bits)
+        public_jwk = jwk.construct(public.save_pkcs1().decode(), 'RS256').to_dict()
+        public_jwk.update(kid=kid, use='sig')
+        return private.save_pkcs1().decode(), public_jwk
+
+    @property
+    def issuer(self):
+        return 'https://' + self.domain + '/'
+
+    def token(self, permissions=(), kid=None, expires_in=3600, sub='auth0|test', **claims):
+        '''a signed access token carrying the given permissions and extra claims'''
+        kid = kid or self.kids[0]
+        payload = {
+            'iss': self.issuer,
+            'aud': self.audience,
+            'sub': sub,
+            'iat': int(time.time()),
+            'exp': int(time.time()) + expires_in,
+            'permissions': list(permissions)
+        }
+        payload.update(claims)
+        return jwt.encode(payload, self.signing_keys[kid], algorithm=self.algorithm,
+                          headers={'kid': kid})
+
+    def jwks(self, kids=None):
+        '''the JWKS document an identity provider would publish (RS256 only)'''
+        if self.algorithm != 'RS256':
+            raise ValueError('HS256 secrets are not published')
+        return {'keys': [self.public_keys[kid] for kid in (kids or self.kids)]}
+
+    def keys(self):
+        '''StaticKeys verifying this issuer's tokens'''
+        return StaticKeys(self.public_keys)
+
+    def configure(self, verifier, **options):
+        '''points an existing verifier, e.g. an app's, at this issuer'''
+        options.setdefault('keys', self.keys())
+        return verifier.configure(domain=self.domain, audience=self.audience,
+                                  algorithms=[self.algorithm], **options)
+
+    def verifier(self, **options):
+        '''a new TokenVerifier accepting this issuer's tokens'''
+        options.setdefault('keys', self.keys())
+        return TokenVerifier(self.domain, self.audience, [self.algorithm], **options)
+
+
+class StubJWKSServer(object):
+    '''
+    StubJWKSServer(issuer)
+        serves the issuer's JWKS on localhost the way the identity provider
+        does, counting requests; kids, cache_control, down and delay (seconds
+        before each response) can be changed by tests
+    '''
+    __test__ = False
+
+    def __init__(self, issuer, kids=None, cache_control='max-age=600'):
+        self.issuer = issuer
+        self.kids = list(kids or issuer.kids[:1])
+        self.cache_control = cache_control
+        self.down = False
+        self.delay = 0
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.down:
+                    self.send_error(503)
+                    return
+                body = json.dumps(stub.issuer.jwks(stub.kids)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                if stub.cache_control:
+                    self.send_header('Cache-Control', stub.cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/.well-known/jwks.json' % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def jwks_cache(self, **options):
+        return JWKSCache(self.url, **options)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,109 @@
+'''
+token_cache.py
+    bounded cache of bearer tokens that already passed verification
+
+    EXAMPLE
+        verified_tokens = VerifiedTokenCache()
+
+        verified = verified_tokens.get(token)
+        if verified is None:
+            start = time.perf_counter()
+            payload = jwt.decode(token, ...)
+            verified = verified_tokens.put(token, payload, time.perf_counter() - start)
+        verified.payload, verified.permissions
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    never kept, and each one is dropped at the token's exp claim: a cached
+    payload is only ever returned while jwt.decode would still accept it.
+    Tokens without exp are not cached. The permissions claim is turned into a
+    frozenset once per token, so permission checks are set lookups.
+'''
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+'''
+VerifiedToken
+    payload: the decoded claims
+    permissions: frozenset of the permissions claim, or None if the token has none
+'''
+VerifiedToken = namedtuple('VerifiedToken', ['payload', 'permissions'])
+
+
+class VerifiedTokenCache(object):
+    '''
+    VerifiedTokenCache(max_entries)
+        LRU of VerifiedTokens; stats() reports the hit rate and the
+        verification time hits have saved
+    '''
+    def __init__(self, max_entries=1024, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.verify_seconds = 0.0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build(payload):
+        '''the VerifiedToken of a payload, without caching it'''
+        permissions = payload.get('permissions')
+        return VerifiedToken(payload, None if permissions is None else frozenset(permissions))
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, cost, verified = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += cost
+            return verified
+
+    def put(self, token, payload, cost=0.0):
+        '''
+        put(token, payload, cost)
+            stores and returns the VerifiedToken for a freshly verified payload
+            cost: seconds the verification took, credited on every later hit
+        '''
+        verified = self.build(payload)
+        with self._lock:
+            self.verify_seconds += cost
+            expires = payload.get('exp')
+            if not isinstance(expires, (int, float)) or expires <= self.clock():
+                return verified
+            key = self._digest(token)
+            self._entries[key] = (expires, cost, verified)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return verified
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'verify_ms': round(self.verify_seconds * 1000, 3),
+            'saved_ms': round(self.saved_seconds * 1000, 3),
+        }
@@ -0,0 +1,302 @@
+'''
+verifier.py
+    bearer token verification and the requires_auth decorator
+
+    EXAMPLE
+        verifier = TokenVerifier('example.us.auth0.com', audience='shop')
+
+        @app.route('/drinks-detail')
+        @verifier.requires_auth('get:drinks-detail')
+        def get_drinks_detail(payload): ...
+
+        @app.errorhandler(AuthError)
+        def handle_auth_error(error): ...
+
+    A TokenVerifier keeps no per-request state: its key source and
+    verified-token cache guard themselves with locks, and its settings are one
+    immutable tuple that configure() replaces, so one instance is shared by
+    every thread, greenlet or worker task of an app. configure() is also how
+    tests and benchmarks point an app at a local TestIssuer.
+'''
+import ast
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import request
+from jose import jwt
+
+from .jwks import JWKSCache, JWKSUnavailable
+from .token_cache import VerifiedTokenCache
+
+
+class AuthError(Exception):
+    '''
+    AuthError Exception
+        A standardized way to communicate auth failure modes
+    '''
+    def __init__(self, error, status_code):
+        self.error = error
+        self.status_code = status_code
+
+
+def get_token_auth_header():
+    '''the bearer token of the current request's Authorization header'''
+    auth = request.headers.get('Authorization', None)
+
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    return parts[1]
+
+
+def compile_permissions(permissions, any_of=()):
+    '''
+    compile_permissions(permissions, any_of)
+        permissions: permissions that are all required; one may list
+            alternatives separated by '|', e.g. 'patch:movies | admin'
+        any_of: permissions of which at least one is required
+        returns a tuple of frozensets, each of which must share a permission
+        with the token's permissions
+    '''
+    required = []
+    for permission in permissions:
+        alternatives = frozenset(p.strip() for p in permission.split('|') if p.strip())
+        if alternatives:
+            required.append(alternatives)
+    if any_of:
+        required.append(frozenset(any_of))
+    return tuple(required)
+
+
+def check_permissions(permission, payload, granted=None, status_code=401):
+    '''
+    check_permissions(permission, payload)
+        permission: a permission string or the result of compile_permissions()
+        granted: the token's permissions as a frozenset, if already built
+        status_code: status of the AuthError raised for a missing permission
+    '''
+    if 'permissions' not in payload:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if isinstance(permission, str):
+        permission = compile_permissions((permission,))
+    if granted is None:
+        granted = frozenset(payload['permissions'])
+    for alternatives in permission:
+        if granted.isdisjoint(alternatives):
+            raise AuthError({
+                'code': 'unauthorized',
+                'description': 'Permission not found.'
+            }, status_code)
+    return True
+
+
+def parse_algorithms(value):
+    '''algorithms from a list or an environment string like "['RS256']" or "RS256,HS256"'''
+    if not isinstance(value, str):
+        return list(value)
+    value = value.strip()
+    if value.startswith('['):
+        return list(ast.literal_eval(value))
+    return [algorithm.strip() for algorithm in value.split(',') if algorithm.strip()]
+
+
+'''
+VerifierSettings
+    everything a verification reads, swapped as a whole by configure() so a
+    request in flight never sees half of an old and half of a new configuration
+'''
+VerifierSettings = namedtuple('VerifierSettings',
+                              ['domain', 'issuer', 'audience', 'algorithms', 'keys', 'token_cache'])
+
+
+class TokenVerifier(object):
+    '''
+    TokenVerifier(domain, audience, algorithms)
+        domain: the Auth0 tenant; tokens must be issued by https://<domain>/
+            and are checked against the keys at https://<domain>/.well-known/jwks.json
+        keys: any object with get_key(kid), in place of that JWKSCache
+        token_cache: a VerifiedTokenCache, True for a new one, or False to
+            verify every request in full
+        permission_status: status code when a permission is missing (401 or 403)
+    '''
+    def __init__(self, domain, audience, algorithms=('RS256',), keys=None,
+                 token_cache=True, permission_status=401):
+        self.permission_status = permission_status
+        self.settings = None
+        self._lock = threading.Lock()
+        self.configure(domain=domain, audience=audience, algorithms=algorithms, keys=keys,
+                       token_cache=token_cache)
+
+    @classmethod
+    def from_env(cls, environ=os.environ, **options):
+        '''a verifier configured from AUTH0_DOMAIN, API_AUDIENCE and ALGORITHMS'''
+        return cls(environ['AUTH0_DOMAIN'], environ['API_AUDIENCE'],
+                   environ.get('ALGORITHMS', 'RS256'), **options)
+
+    @property
+    def keys(self):
+        return self.settings.keys
+
+    @property
+    def token_cache(self):
+        return self.settings.token_cache
+
+    def configure(self, domain=None, audience=None, algorithms=None, keys=None, token_cache=None):
+        '''
+        configure(**options)
+            changes the given settings; a new domain brings a new JWKSCache
+            unless keys are given, and new keys a fresh token cache, since
+            payloads verified with the old keys must not outlive them
+        '''
+        with self._lock:
+            current = self.settings
+            if domain is not None and keys is None:
+                keys = JWKSCache('https://' + domain + '/.well-known/jwks.json')
+            if token_cache is None and current is not None:
+                token_cache = current.token_cache
+                if keys is not None and token_cache is not None:
+                    token_cache = True
+            if token_cache is True:
+                token_cache = VerifiedTokenCache()
+            domain = domain or current.domain
+            self.settings = VerifierSettings(
+                domain=domain,
+                issuer='https://' + domain + '/',
+                audience=audience or current.audience,
+                algorithms=parse_algorithms(algorithms) if algorithms is not None else current.algorithms,
+                keys=keys or current.keys,
+                token_cache=token_cache or None
+            )
+        return self
+
+    def verify_token(self, token):
+        '''
+        verify_token(token)
+            the VerifiedToken (payload, permissions frozenset) of a bearer token,
+            from the verified-token cache when the token was seen before
+        '''
+        settings = self.settings
+        token_cache = settings.token_cache
+        if token_cache is not None:
+            verified = token_cache.get(token)
+            if verified is not None:
+                return verified
+        start = time.perf_counter()
+
+        try:
+            unverified_header = jwt.get_unverified_header(token)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+        if 'kid' not in unverified_header:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Authorization malformed.'
+            }, 401)
+
+        try:
+            key = settings.keys.get_key(unverified_header['kid'])
+        except JWKSUnavailable:
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 503)
+        if not key:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to find the appropriate key.'
+            }, 400)
+
+        try:
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=settings.algorithms,
+                audience=settings.audience,
+                issuer=settings.issuer
+            )
+        except jwt.ExpiredSignatureError:
+            raise AuthError({
+                'code': 'token_expired',
+                'description': 'Token expired.'
+            }, 401)
+        except jwt.JWTClaimsError:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Invalid claim. Check the audience and issuer.'
+            }, 401)
+        except Exception:
+            raise AuthError({
+                'code': 'invalid_header',
+                'description': 'Unable to parse authentication token.'
+            }, 400)
+
+        if token_cache is None:
+            return VerifiedTokenCache.build(payload)
+        return token_cache.put(token, payload, time.perf_counter() - start)
+
+    def verify_decode_jwt(self, token):
+        '''the decoded payload of a valid bearer token'''
+        return self.verify_token(token).payload
+
+    def check_permissions(self, permission, payload, granted=None):
+        return check_permissions(permission, payload, granted, self.permission_status)
+
+    def requires_auth(self, *permissions, any_of=()):
+        '''
+        requires_auth(*permissions, any_of=())
+            view decorator passing the verified payload as the first argument;
+            see compile_permissions() for the permission arguments
+        '''
+        # compiled once, when the view is decorated
+        required = compile_permissions(permissions, any_of)
+
+        def requires_auth_decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                token = get_token_auth_header()
+                verified = self.verify_token(token)
+                self.check_permissions(required, verified.payload, verified.permissions)
+                return f(verified.payload, *args, **kwargs)
+
+            return wrapper
+        return requires_auth_decorator
+
+    def stats(self):
+        settings = self.settings
+        return {
+            'tokens': settings.token_cache.stats() if settings.token_cache is not None else None,
+            'jwks_fetches': getattr(settings.keys, 'fetches', None)
+        }
@@ -0,0 +1,17 @@
+from setuptools import setup
+
+setup(
+    name='fsnd_auth',
+    version='0.1.0',
+    description='Auth0 bearer token verification shared by the FSND Flask apps',
+    packages=['fsnd_auth'],
+    python_requires='>=3.6',
+    install_requires=[
+        'Flask',
+        'python-jose',
+    ],
+    extras_require={
+        # key generation for TestIssuer('RS256')
+        'testing': ['rsa'],
+    },
+)
@@ -0,0 +1,357 @@
+import threading
+import time
+import unittest
+
+from flask import Flask, jsonify
+from jose import jwt
+
+from fsnd_auth import (AuthError, JWKSCache, JWKSUnavailable, StaticKeys, TokenVerifier,
+                       VerifiedTokenCache, check_permissions, compile_permissions, max_age,
+                       parse_algorithms)
+from fsnd_auth.testing import StubJWKSServer, TestIssuer
+
+ISSUER = TestIssuer('RS256', domain='fsnd.test', audience='fsnd', kids=('key-1', 'key-2'))
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the JWKS cache test case"""
+
+    def setUp(self):
+        self.server = StubJWKSServer(ISSUER)
+        self.clock = FakeClock()
+        self.jwks = self.server.jwks_cache(clock=self.clock)
+        self.verifier = ISSUER.verifier(keys=self.jwks)
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_keys_fetched_once(self):
+        # distinct tokens, so each one is verified against the keys
+        for permission in ('get:movies', 'get:actors', 'post:movies', 'post:actors', 'delete:movies'):
+            payload = self.verifier.verify_decode_jwt(ISSUER.token(permissions=(permission,)))
+        self.assertEqual(payload['sub'], 'auth0|test')
+        self.assertEqual(self.server.requests, 1)
+
+    def test_cache_control_max_age(self):
+        self.server.cache_control = 'public, max-age=120'
+        self.jwks.get_key('key-1')
+        self.clock.now += 119
+        self.jwks.get_key('key-1')
+        self.assertEqual(self.server.requests, 1)
+        self.clock.now += 2
+        self.jwks.get_key('key-1')
+        self.assertEqual(self.server.requests, 2)
+
+    def test_max_age_parsing(self):
+        self.assertEqual(max_age('public, max-age=86400, stale-while-revalidate=60'), 86400)
+        self.assertEqual(max_age('no-store'), 0)
+        self.assertIsNone(max_age('public'))
+        self.assertIsNone(max_age(None))
+
+    def test_unknown_kid_refetches_once_per_interval(self):
+        self.jwks.get_key('key-1')
+        self.clock.now += 31
+        self.server.kids = ['key-1', 'key-2']
+        payload = self.verifier.verify_decode_jwt(ISSUER.token(kid='key-2'))
+        self.assertEqual(payload['sub'], 'auth0|test')
+        self.assertEqual(self.server.requests, 2)
+        # forged kids right after a fetch do not reach the provider
+        for _ in range(10):
+            self.assertIsNone(self.jwks.get_key('forged'))
+        self.assertEqual(self.server.requests, 2)
+        self.clock.now += 31
+        self.assertIsNone(self.jwks.get_key('forged'))
+        self.assertEqual(self.server.requests, 3)
+
+    def test_background_refresh(self):
+        self.jwks.get_key('key-1')
+        self.clock.now += 500
+        self.server.kids = ['key-2']
+        # served from the cache while the refresh runs
+        self.assertIsNotNone(self.jwks.get_key('key-1'))
+        self.jwks._refresh_thread.join(5)
+        self.assertEqual(self.server.requests, 2)
+        self.assertIsNotNone(self.jwks.get_key('key-2'))
+        self.assertEqual(self.server.requests, 2)
+
+    def test_stale_keys_served_while_provider_down(self):
+        self.jwks.get_key('key-1')
+        self.server.down = True
+        self.clock.now += 601
+        self.assertIsNotNone(self.jwks.get_key('key-1'))
+        self.assertEqual(self.server.requests, 2)
+        self.clock.now += 10
+        self.assertIsNotNone(self.jwks.get_key('key-1'))
+        self.assertEqual(self.server.requests, 2)
+        self.server.down = False
+        self.clock.now += 30
+        self.jwks.get_key('key-1')
+        self.assertEqual(self.server.requests, 3)
+
+    def test_503_provider_never_reached(self):
+        self.server.down = True
+        with self.assertRaises(JWKSUnavailable):
+            self.jwks.get_key('key-1')
+        with self.assertRaises(AuthError) as context:
+            self.verifier.verify_decode_jwt(ISSUER.token())
+        self.assertEqual(context.exception.status_code, 503)
+
+
+    def test_first_fetch_under_concurrent_requests(self):
+        self.server.delay = 0.2
+        jwks = self.server.jwks_cache()
+        barrier = threading.Barrier(16)
+        keys, errors = [], []
+
+        def request():
+            barrier.wait()
+            try:
+                keys.append(jwks.get_key('key-1'))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=request) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(keys), 16)
+        self.assertTrue(all(key is not None for key in keys))
+        self.assertEqual(self.server.requests, 1)
+
+    def test_keys_published_after_their_expiry(self):
+        # a request arriving just as the first fetch stores the keys must not
+        # see them without their expiry times
+        errors = []
+        test = self
+
+        class ObservedJWKSCache(JWKSCache):
+            def __setattr__(self, name, value):
+                super(ObservedJWKSCache, self).__setattr__(name, value)
+                if name == '_keys' and value is not None:
+                    thread = threading.Thread(target=self.concurrent_request)
+                    thread.start()
+                    thread.join(5)
+
+            def concurrent_request(self):
+                try:
+                    test.assertIsNotNone(self.get_key('key-1'))
+                except Exception as e:
+                    errors.append(e)
+
+        ObservedJWKSCache(self.server.url).get_key('key-1')
+        self.assertEqual(errors, [])
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified-token cache test case"""
+
+    def setUp(self):
+        self.verifier = ISSUER.verifier()
+
+    def test_repeated_token_verified_once(self):
+        token = ISSUER.token()
+        first = self.verifier.verify_decode_jwt(token)
+        decode = jwt.decode
+        try:
+            jwt.decode = None
+            for _ in range(3):
+                self.assertEqual(self.verifier.verify_decode_jwt(token), first)
+        finally:
+            jwt.decode = decode
+        stats = self.verifier.stats()['tokens']
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (3, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.75)
+        self.assertGreater(stats['saved_ms'], 0)
+
+    def test_tampered_token_not_served_from_cache(self):
+        token = ISSUER.token()
+        self.verifier.verify_decode_jwt(token)
+        header, payload, signature = token.split('.')
+        with self.assertRaises(AuthError):
+            self.verifier.verify_decode_jwt('.'.join([header, payload, signature[:-4] + 'AAAA']))
+
+    def test_failed_verification_not_cached(self):
+        token = ISSUER.token(expires_in=-60)
+        for _ in range(2):
+            with self.assertRaises(AuthError) as context:
+                self.verifier.verify_decode_jwt(token)
+        self.assertEqual(context.exception.error['code'], 'token_expired')
+        self.assertEqual(self.verifier.stats()['tokens']['entries'], 0)
+
+    def test_entry_expires_with_token(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put('token', {'exp': clock.now + 60})
+        self.assertIsNotNone(cache.get('token'))
+        clock.now += 60
+        self.assertIsNone(cache.get('token'))
+        cache.put('no-exp', {'sub': 'x'})
+        self.assertIsNone(cache.get('no-exp'))
+
+    def test_evicts_least_recently_used(self):
+        cache = VerifiedTokenCache(max_entries=2)
+        exp = time.time() + 60
+        for token in ('a', 'b'):
+            cache.put(token, {'exp': exp, 'sub': token})
+        cache.get('a')
+        cache.put('c', {'exp': exp, 'sub': 'c'})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').payload['sub'], 'a')
+
+    def test_cache_disabled(self):
+        verifier = ISSUER.verifier(token_cache=False)
+        token = ISSUER.token(permissions=('get:movies',))
+        self.assertEqual(verifier.verify_token(token).permissions, frozenset({'get:movies'}))
+        self.assertIsNone(verifier.stats()['tokens'])
+
+
+class PermissionsTestCase(unittest.TestCase):
+    """This class represents the requires_auth permission checks"""
+
+    def setUp(self):
+        self.verifier = ISSUER.verifier()
+        requires_auth = self.verifier.requires_auth
+
+        app = Flask(__name__)
+
+        @app.route('/all')
+        @requires_auth('get:movies', 'get:actors')
+        def all_of(payload):
+            return jsonify({'success': True})
+
+        @app.route('/any')
+        @requires_auth(any_of=('patch:movies', 'patch:actors'))
+        def any_of(payload):
+            return jsonify({'success': True})
+
+        @app.route('/expression')
+        @requires_auth('get:movies', 'delete:movies | admin')
+        def expression(payload):
+            return jsonify({'success': True})
+
+        @app.errorhandler(AuthError)
+        def unauthorized(error):
+            return jsonify({'success': False, 'message': error.error}), error.status_code
+
+        self.client = app.test_client
+
+    def get(self, url, *permissions):
+        token = ISSUER.token(permissions=permissions)
+        return self.client().get(url, headers={'Authorization': 'Bearer ' + token}).status_code
+
+    def test_compile_permissions(self):
+        self.assertEqual(compile_permissions(('get:movies', 'a | b'), any_of=('c', 'd')),
+                         (frozenset({'get:movies'}), frozenset({'a', 'b'}), frozenset({'c', 'd'})))
+        self.assertEqual(compile_permissions(()), ())
+
+    def test_all_of(self):
+        self.assertEqual(self.get('/all', 'get:movies', 'get:actors'), 200)
+        self.assertEqual(self.get('/all', 'get:movies'), 401)
+
+    def test_any_of(self):
+        self.assertEqual(self.get('/any', 'patch:actors'), 200)
+        self.assertEqual(self.get('/any', 'get:actors'), 401)
+
+    def test_expression(self):
+        self.assertEqual(self.get('/expression', 'get:movies', 'admin'), 200)
+        self.assertEqual(self.get('/expression', 'get:movies', 'delete:movies'), 200)
+        self.assertEqual(self.get('/expression', 'admin'), 401)
+
+    def test_401_header_missing(self):
+        self.assertEqual(self.client().get('/all').status_code, 401)
+
+    def test_403_permission_status(self):
+        self.verifier.permission_status = 403
+        self.assertEqual(self.get('/all', 'get:movies'), 403)
+
+    def test_400_permissions_claim_missing(self):
+        with self.assertRaises(AuthError) as context:
+            check_permissions('get:movies', {'sub': 'auth0|test'})
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_permissions_built_once_per_token(self):
+        token = ISSUER.token(permissions=('get:movies', 'get:actors'))
+        first = self.verifier.verify_token(token)
+        self.assertEqual(first.permissions, frozenset({'get:movies', 'get:actors'}))
+        self.assertIs(self.verifier.verify_token(token).permissions, first.permissions)
+        self.assertTrue(check_permissions('get:actors', first.payload))
+
+
+class TokenVerifierTestCase(unittest.TestCase):
+    """This class represents the verifier configuration and the test issuer"""
+
+    def test_hs256_issuer(self):
+        issuer = TestIssuer('HS256', domain='hs.test', audience='hs')
+        payload = issuer.verifier().verify_decode_jwt(issuer.token(permissions=('get:drinks',)))
+        self.assertEqual(payload['permissions'], ['get:drinks'])
+        with self.assertRaises(ValueError):
+            issuer.jwks()
+
+    def test_wrong_audience_rejected(self):
+        verifier = TokenVerifier(ISSUER.domain, 'other', keys=ISSUER.keys())
+        with self.assertRaises(AuthError) as context:
+            verifier.verify_token(ISSUER.token())
+        self.assertEqual(context.exception.error['code'], 'invalid_claims')
+
+    def test_algorithm_not_allowed(self):
+        issuer = TestIssuer('HS256', domain=ISSUER.domain, audience=ISSUER.audience, kids=('key-1',))
+        # an HS256 token must not verify against a verifier expecting RS256
+        verifier = ISSUER.verifier(keys=StaticKeys(issuer.public_keys))
+        with self.assertRaises(AuthError):
+            verifier.verify_token(issuer.token())
+
+    def test_configure_points_verifier_at_issuer(self):
+        verifier = TokenVerifier('tenant.auth0.com', 'shop', "['RS256']")
+        self.assertIsInstance(verifier.keys, JWKSCache)
+        cache = verifier.token_cache
+        issuer = TestIssuer('HS256', domain='local.test', audience='shop')
+        issuer.configure(verifier)
+        self.assertEqual(verifier.settings.issuer, 'https://local.test/')
+        self.assertEqual(verifier.settings.algorithms, ['HS256'])
+        # payloads verified with the old keys are not carried over
+        self.assertIsNot(verifier.token_cache, cache)
+        self.assertEqual(verifier.verify_decode_jwt(issuer.token())['aud'], 'shop')
+
+    def test_from_env(self):
+        verifier = TokenVerifier.from_env({'AUTH0_DOMAIN': 'tenant.auth0.com', 'API_AUDIENCE': 'Casting'})
+        self.assertEqual(verifier.settings.audience, 'Casting')
+        self.assertEqual(verifier.settings.algorithms, ['RS256'])
+        self.assertEqual(parse_algorithms('RS256, HS256'), ['RS256', 'HS256'])
+
+    def test_concurrent_verification(self):
+        verifier = ISSUER.verifier()
+        tokens = [ISSUER.token(permissions=('p%d' % i,)) for i in range(8)]
+        errors = []
+
+        def verify():
+            try:
+                for _ in range(25):
+                    for i, token in enumerate(tokens):
+                        assert verifier.verify_token(token).permissions == {'p%d' % i}
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=verify) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        stats = verifier.stats()['tokens']
+        self.assertEqual(stats['hits'] + stats['misses'], 8 * 25 * 8)
+        self.assertEqual(stats['entries'], 8)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -4,16 +4,24 @@
 import sys
 import json
 import dateutil.parser
-import babel
+import babel.dates
+import functools
 from sqlalchemy import func
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, stream_with_context
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
+import time
+import click
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
+from search import FullTextSearch
+from pagination import paginate, InvalidCursor
+from cache import PageCache
+import export
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -24,6 +32,7 @@ app.config.from_object('config')
 db = SQLAlchemy(app)
 
 migrate = Migrate(app, db)
+page_cache = PageCache(app)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -33,10 +42,10 @@ class Venue(db.Model):
     __tablename__ = 'venue'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    genres = db.Column(ARRAY(db.String()))
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -45,6 +54,17 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
     shows = db.relationship('Show', backref='venue', lazy=True)
+    # maintained by record_upcoming_shows() and sweep_upcoming_shows()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    # maintained by a database trigger, see search.py
+    search_vector = db.deferred(db.Column(TSVECTOR, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue()))
+
+    __table_args__ = (
+        db.Index('ix_venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        db.Index('ix_venue_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     def __repr__(self):
         return f'<Venue {self.name}>'
@@ -53,17 +73,28 @@ class Artist(db.Model):
     __tablename__ = 'artist'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(ARRAY(db.String()))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
     shows = db.relationship('Show', backref='artist', lazy=True)
+    # maintained by record_upcoming_shows() and sweep_upcoming_shows()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    # maintained by a database trigger, see search.py
+    search_vector = db.deferred(db.Column(TSVECTOR, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue()))
+
+    __table_args__ = (
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
@@ -76,27 +107,177 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
     def __repr__(self):
         return f'<Show {self.id} {self.name}>'
 
+class ImportCheckpoint(db.Model):
+    __tablename__ = 'import_checkpoint'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # '<kind>:<absolute path>' of the file being imported
+    source = db.Column(db.String(1000), nullable=False, unique=True)
+    # input records consumed by committed batches
+    records = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<ImportCheckpoint {self.source} {self.records}>'
+
+search = FullTextSearch(db)
+search.register(Venue)
+search.register(Artist)
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_show_count and next_show_at so listings
+# read them straight off the row. New shows bump them inside their own
+# transaction; shows that slip into the past are rolled forward by the
+# sweeper, which only has to revisit rows whose next_show_at has passed.
+
+def record_upcoming_shows(shows, now=None):
+  '''
+  record_upcoming_shows(shows)
+      adds new shows, given as (venue_id, artist_id, start_time) tuples, to
+      their venues' and artists' counters in the caller's transaction; one
+      batched UPDATE per table however many shows there are
+  '''
+  now = now or datetime.now()
+  for model, position in ((Venue, 0), (Artist, 1)):
+    pending = {}
+    for show in shows:
+      start_time = show[2]
+      if start_time > now:
+        count, first = pending.get(int(show[position]), (0, start_time))
+        pending[int(show[position])] = (count + 1, min(first, start_time))
+    if not pending:
+      continue
+    table = model.__table__
+    db.session.execute(
+      table.update().where(table.c.id == db.bindparam('b_id')).values(
+        upcoming_show_count=table.c.upcoming_show_count + db.bindparam('b_count'),
+        next_show_at=func.least(func.coalesce(table.c.next_show_at, db.bindparam('b_first')), db.bindparam('b_first'))
+      ),
+      [{'b_id': entity_id, 'b_count': count, 'b_first': first}
+       for entity_id, (count, first) in pending.items()]
+    )
+
+def sweep_upcoming_shows(now=None, rebuild=False):
+  '''
+  sweep_upcoming_shows(now, rebuild)
+      recounts every venue and artist whose next show has started (all of them
+      when rebuild is set) and commits; returns the number of rows updated
+  '''
+  now = now or datetime.now()
+  updated = 0
+  for model, show_fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    upcoming = db.session.query(Show).filter(show_fk == model.id, Show.start_time > now)
+    query = db.session.query(model)
+    if not rebuild:
+      query = query.filter(model.next_show_at <= now)
+    updated += query.update({
+      model.upcoming_show_count: upcoming.with_entities(func.count(Show.id)).as_scalar(),
+      model.next_show_at: upcoming.with_entities(func.min(Show.start_time)).as_scalar()
+    }, synchronize_session=False)
+  db.session.commit()
+  return updated
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  '''
+  datetime_pattern(format, locale)
+      the compiled Babel pattern and parsed Locale for a format name or
+      pattern, built once per (format, locale) pair
+  '''
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=16384)
+def format_datetime_cached(value, format, locale):
+  # listings repeat the same start times, so formatted strings are memoized too
+  if format in ('short', 'long'):
+    return babel.dates.format_datetime(value, format, locale=locale)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  '''
+  format_datetime(value, format)
+      Jinja filter; value is a datetime, or a string dateutil can parse
+  '''
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  return format_datetime_cached(value, format, locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+def url_with_args(**args):
+  '''the current page's URL with the given query arguments replaced, others kept'''
+  query = request.args.to_dict(flat=False)
+  query.update(args)
+  return url_for(request.endpoint, **request.view_args, **query)
+
+app.jinja_env.globals['url_with_args'] = url_with_args
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
+def upcoming_shows_listing(model):
+  '''
+  upcoming_shows_listing(model)
+      query of (id, name, city, state, num_upcoming_shows) rows for a Venue or
+      Artist, read from the maintained counter column
+  '''
+  return db.session.query(model.id, model.name, model.city, model.state,
+                          model.upcoming_show_count.label('num_upcoming_shows'))
+
+def listing_filters(model, seeking):
+  '''
+  listing_filters(model, seeking)
+      criteria from the request's ?genre= (repeatable, all must match), ?state=,
+      ?city= and ?seeking=1 arguments; seeking is the model's seeking_* column.
+      Genres are matched with @>, which the GIN index on genres answers.
+  '''
+  criteria = []
+  genres = [genre for genre in request.args.getlist('genre') if genre]
+  if genres:
+    criteria.append(model.genres.contains(genres))
+  if request.args.get('state'):
+    criteria.append(model.state == request.args['state'])
+  if request.args.get('city'):
+    criteria.append(model.city == request.args['city'])
+  if request.args.get('seeking'):
+    criteria.append(seeking.is_(True))
+  return criteria
+
+def listing_page(query, columns):
+  '''
+  listing_page(query, columns)
+      the page of query selected by the request's ?cursor=, keyset-paginated on columns
+  '''
+  try:
+    return paginate(query, columns, request.args.get('cursor'), app.config['ITEMS_PER_PAGE'])
+  except InvalidCursor:
+    abort(400)
+
 @app.route('/')
 def index():
   return render_template('pages/home.html')
@@ -107,42 +288,43 @@ def index():
 
 @app.route('/venues')
 def venues():
-  venues = Venue.query.order_by(Venue.state, Venue.city).all()
+  page = listing_page(upcoming_shows_listing(Venue).filter(*listing_filters(Venue, Venue.seeking_talent)),
+                      (Venue.state, Venue.city, Venue.name, Venue.id))
+
   data = []
   current_location = [None, None]
-  for venue in venues:
-      upcoming_shows = [show for show in venue.shows if show.start_time>datetime.now()]
+  for row in page.items:
       venue_data = {
-        'id': venue.id,
-        'name': venue.name,
-        'num_upcoming_shows': len(upcoming_shows)
+        'id': row.id,
+        'name': row.name,
+        'num_upcoming_shows': row.num_upcoming_shows
       }
-      if current_location[0] == venue.city and current_location[1] == venue.state:
-          current_area = len(data) - 1
-          data[current_area]['venues'].append(venue_data)
+      if current_location[0] == row.city and current_location[1] == row.state:
+          data[-1]['venues'].append(venue_data)
       else:
           data.append({
-          "city": venue.city,
-          "state": venue.state,
+          "city": row.city,
+          "state": row.state,
           "venues": [venue_data]
           })
-          current_location = [venue.city, venue.state]
+          current_location = [row.city, row.state]
 
-  return render_template('pages/venues.html', areas=data);
+  return render_template('pages/venues.html', areas=data, page=page, genres=genre_choices, states=state_choices);
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
 
   search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
+  match = search.match(Venue, search_term)
+  venues = upcoming_shows_listing(Venue).filter(match.criterion) \
+    .order_by(*match.order_by, Venue.name, Venue.id).all()
   data = []
 
   for venue in venues:
-      upcoming_shows = [show for show in venue.shows if show.start_time>datetime.now()]
       data.append({
         'id': venue.id,
         'name': venue.name,
-        'num_upcoming_shows': len(upcoming_shows)
+        'num_upcoming_shows': venue.num_upcoming_shows
       })
   response={
     "count": len(venues),
@@ -152,29 +334,26 @@ def search_venues():
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}', 'artists')
 def show_venue(venue_id):
-  venue = Venue.query.get(venue_id)
+  # One round trip: the venue, its shows and each show's artist arrive in a
+  # single joined query, split into past/upcoming against one timestamp.
+  now = datetime.now()
+  venue = Venue.query.outerjoin(Venue.shows).outerjoin(Show.artist) \
+    .options(db.contains_eager(Venue.shows).contains_eager(Show.artist)) \
+    .filter(Venue.id == venue_id).order_by(Show.start_time).one_or_none()
+  if venue is None:
+    abort(404)
 
-  upcoming_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()
   upcoming_shows = []
-
-  past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now()).all()
   past_shows = []
 
-  for show in past_shows_query:
-    past_shows.append({
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  for show in upcoming_shows_query:
-    upcoming_shows.append({
+  for show in venue.shows:
+    (upcoming_shows if show.start_time > now else past_shows).append({
       "artist_id": show.artist_id,
       "artist_name": show.artist.name,
       "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S")
+      "start_time": show.start_time
     })
 
   data = {
@@ -195,7 +374,6 @@ def show_venue(venue_id):
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows),
   }
-  print(venue.genres)
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -270,6 +448,7 @@ def delete_venue(venue_id):
         if error:
             flash(f'An error occurred. Venue {venue_id} could not be deleted.')
         if not error:
+            page_cache.invalidate(f'venue:{venue_id}', 'venues')
             flash(f'Venue {venue_id} was successfully deleted.')
 
 
@@ -279,22 +458,24 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-    artists = Artist.query.all()
+    artists_query = db.session.query(Artist.id, Artist.name).filter(*listing_filters(Artist, Artist.seeking_venue))
+    page = listing_page(artists_query, (Artist.name, Artist.id))
 
-    return render_template('pages/artists.html', artists=artists)
+    return render_template('pages/artists.html', artists=page.items, page=page, genres=genre_choices, states=state_choices)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
   search_term = request.form.get('search_term', '')
-  artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
+  match = search.match(Artist, search_term)
+  artists = upcoming_shows_listing(Artist).filter(match.criterion) \
+    .order_by(*match.order_by, Artist.name, Artist.id).all()
   data = []
 
   for artist in artists:
-      upcoming_shows = [show for show in artist.shows if show.start_time>datetime.now()]
       data.append({
         'id': artist.id,
         'name': artist.name,
-        'num_upcoming_shows': len(upcoming_shows)
+        'num_upcoming_shows': artist.num_upcoming_shows
       })
   response={
     "count": len(artists),
@@ -303,40 +484,31 @@ def search_artists():
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}', 'venues')
 def show_artist(artist_id):
+  # Same single joined query as show_venue, from the artist's side.
+  now = datetime.now()
+  selected_artist = Artist.query.outerjoin(Artist.shows).outerjoin(Show.venue) \
+    .options(db.contains_eager(Artist.shows).contains_eager(Show.venue)) \
+    .filter(Artist.id == artist_id).order_by(Show.start_time).one_or_none()
+  if selected_artist is None:
+    abort(404)
 
-  selected_artist = Artist.query.get(artist_id)
-
-  past_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time<datetime.now()).all()
   past_shows = []
-
-  for show in past_query:
-    past_shows.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  upcoming_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()
   upcoming_shows = []
 
-  for show in upcoming_query:
-    upcoming_shows.append({
+  for show in selected_artist.shows:
+    (upcoming_shows if show.start_time > now else past_shows).append({
       "venue_id": show.venue_id,
       "venue_name": show.venue.name,
       "venue_image_link": show.venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+      "start_time": show.start_time
     })
 
-  genres = ''.join(selected_artist.genres[1:-1]).split(',')
-  if selected_artist.genres[0] != '{':
-      genres = [''.join(selected_artist.genres)]
-
   artist = {
     "id": selected_artist.id,
     "name": selected_artist.name,
-    "genres": genres,
+    "genres": selected_artist.genres or [],
     "city": selected_artist.city,
     "state": selected_artist.state,
     "phone": selected_artist.phone,
@@ -350,7 +522,6 @@ def show_artist(artist_id):
     "past_shows_count": len(past_shows),
     "upcoming_shows_count": len(upcoming_shows),
   }
-  print(selected_artist.genres)
 
   return render_template('pages/show_artist.html', artist=artist)
 
@@ -402,6 +573,7 @@ def edit_artist_submission(artist_id):
     if error:
         flash('Due to an error, the artist could not be edited.')
     if not error:
+        page_cache.invalidate(f'artist:{artist_id}', 'artists')
         flash('Artist was successfully updated!')
 
     return redirect(url_for('show_artist', artist_id=artist_id))
@@ -456,6 +628,7 @@ def edit_venue_submission(venue_id):
   if error:
       flash('Due to an error, the venue could not be edited.')
   if not error:
+      page_cache.invalidate(f'venue:{venue_id}', 'venues')
       flash('Venue was successfully updated!')
   return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -520,19 +693,69 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@page_cache.cached('shows', 'venues', 'artists')
 def shows():
-  all_shows = db.session.query(Show).join(Artist).join(Venue).order_by(Show.start_time).all()
+  shows_query = db.session.query(
+      Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+      Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')
+  ).join(Artist).join(Venue)
+  page = listing_page(shows_query, (Show.start_time, Show.id))
   data = []
-  for show in all_shows:
+  for show in page.items:
       data.append({
           "venue_id": show.venue_id,
-          "venue_name": show.venue.name,
+          "venue_name": show.venue_name,
           "artist_id": show.artist_id,
-          "artist_name": show.artist.name,
-          "artist_image_link": show.artist.image_link,
-          "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+          "artist_name": show.artist_name,
+          "artist_image_link": show.artist_image_link,
+          "start_time": show.start_time
       })
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, page=page)
+
+@app.route('/shows/export')
+def export_shows():
+  '''
+  export_shows()
+      streams every show matching the filters as NDJSON or CSV, in start time order
+      ?format=ndjson|csv  ?from=2035-01-01  ?to=2035-02-01  ?venue_id=1  ?artist_id=2
+  '''
+  file_format = request.args.get('format', 'ndjson')
+  if file_format not in export.FORMATS:
+    abort(400)
+  # parse every filter before the response starts; errors can't be reported mid-stream
+  try:
+    filters = []
+    if request.args.get('from'):
+      filters.append(Show.start_time >= dateutil.parser.parse(request.args['from']))
+    if request.args.get('to'):
+      filters.append(Show.start_time < dateutil.parser.parse(request.args['to']))
+    if request.args.get('venue_id'):
+      filters.append(Show.venue_id == int(request.args['venue_id']))
+    if request.args.get('artist_id'):
+      filters.append(Show.artist_id == int(request.args['artist_id']))
+  except (ValueError, OverflowError):
+    abort(400)
+
+  select = db.select([
+      Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+      Show.artist_id, Artist.name.label('artist_name')
+  ]).select_from(Show.__table__.join(Venue.__table__).join(Artist.__table__)) \
+    .where(db.and_(*filters)).order_by(Show.start_time, Show.id)
+  serialize, mimetype = export.FORMATS[file_format]
+
+  def generate():
+    # a dedicated connection with a server-side cursor, held until the last row is sent
+    connection = db.engine.connect()
+    try:
+      result = connection.execution_options(stream_results=True).execute(select)
+      for chunk in serialize(result, list(result.keys())):
+        yield chunk
+    finally:
+      connection.close()
+
+  response = Response(stream_with_context(generate()), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename=shows.%s' % file_format
+  return response
 
 @app.route('/shows/create')
 def create_shows():
@@ -547,9 +770,10 @@ def create_show_submission():
       json_request = request.form
       artist_id = json_request['artist_id']
       venue_id = json_request['venue_id']
-      start_time = json_request['start_time']
+      start_time = dateutil.parser.parse(json_request['start_time'])
       show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
       db.session.add(show)
+      record_upcoming_shows([(venue_id, artist_id, start_time)])
       db.session.commit()
       body['artist_id'] = show.artist_id
       body['venue_id'] = show.venue_id
@@ -563,10 +787,15 @@ def create_show_submission():
       abort(500)
       flash('An error occurred. Your show could not be listed.')
   else:
+      page_cache.invalidate(f"venue:{body['venue_id']}", f"artist:{body['artist_id']}", 'shows')
       flash('Your show was successfully listed!')
 
   return render_template('pages/home.html')
 
+@app.route('/cache/stats')
+def cache_stats():
+  return jsonify(page_cache.stats())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -586,6 +815,34 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('sweep-shows')
+@click.option('--interval', default=0, help='Keep sweeping every INTERVAL seconds.')
+@click.option('--rebuild', is_flag=True, help='Recount every venue and artist.')
+def sweep_shows_command(interval, rebuild):
+  '''Roll upcoming show counters forward past shows that have started.'''
+  while True:
+    click.echo('%d venues and artists updated' % sweep_upcoming_shows(rebuild=rebuild))
+    if not interval:
+      break
+    time.sleep(interval)
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, help='Records per transaction.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an earlier run.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected records here as NDJSON.')
+def import_data_command(kind, path, file_format, batch_size, restart, rejects):
+  '''Bulk import venues, artists or shows from a CSV or NDJSON file.'''
+  # importer.py imports this module, so it is only loaded on demand
+  from importer import import_file
+  import_file(kind, path, file_format, batch_size, restart, rejects, out=click.get_text_stream('stdout'))
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
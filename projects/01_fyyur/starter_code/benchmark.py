@@ -0,0 +1,211 @@
+'''
+benchmark.py
+    seeds a scratch database with a large catalog and reports, for each page
+    under test, how many SQL statements one request issues and how long it takes
+
+    $ python benchmark.py --database-url postgresql://localhost:5432/fyyur_bench venues
+
+    !!NOTE the database is dropped and recreated when --reseed is given or when it is empty
+'''
+import argparse
+import babel.dates
+import dateutil.parser
+import math
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, db, format_datetime, format_datetime_cached, datetime_pattern, sweep_upcoming_shows, Venue, Artist, Show
+from forms import genre_choices, state_choices
+from pagination import AFTER, encode_cursor
+
+SEED_BATCH = 10000
+
+
+class QueryCounter(object):
+    '''
+    QueryCounter
+        counts the statements sent to the database while the block is active
+    '''
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_cursor_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+
+def _insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEED_BATCH:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def seed(num_venues, num_artists, num_shows):
+    db.drop_all()
+    db.create_all()
+    genres = [choice[0] for choice in genre_choices]
+    states = [choice[0] for choice in state_choices]
+    cities = ['City %d' % i for i in range(200)]
+
+    _insert_batches(Venue.__table__, ({
+        'name': 'Venue %d' % i,
+        'city': random.choice(cities),
+        'state': random.choice(states),
+        'address': '%d Main Street' % i,
+        'phone': '555-555-5555',
+        'genres': random.sample(genres, 2),
+        'seeking_talent': bool(i % 2),
+    } for i in range(num_venues)))
+
+    _insert_batches(Artist.__table__, ({
+        'name': 'Artist %d' % i,
+        'city': random.choice(cities),
+        'state': random.choice(states),
+        'phone': '555-555-5555',
+        'genres': random.sample(genres, 2),
+        'seeking_venue': bool(i % 2),
+    } for i in range(num_artists)))
+
+    now = datetime.now()
+    _insert_batches(Show.__table__, ({
+        'venue_id': random.randint(1, num_venues),
+        'artist_id': random.randint(1, num_artists),
+        'start_time': now + timedelta(minutes=random.randint(-525600, 525600)),
+    } for _ in range(num_shows)))
+    sweep_upcoming_shows(rebuild=True)
+    db.session.execute('ANALYZE')
+    db.session.commit()
+
+
+def measure(client, url, repeat):
+    timings = []
+    with QueryCounter(db.engine) as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+    timings.sort()
+    return {
+        'queries': counter.count / repeat,
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[int(math.ceil(0.95 * len(timings))) - 1],
+    }
+
+
+def deep_shows_page():
+    '''the /shows page 100 rows before the end, reached through a keyset cursor'''
+    last = db.session.query(Show.start_time, Show.id) \
+        .order_by(Show.start_time.desc(), Show.id.desc()).offset(100).first()
+    return '/shows?cursor=' + encode_cursor(AFTER, last)
+
+
+def legacy_format_datetime(value, format='medium'):
+    '''the datetime filter before patterns and results were cached'''
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def datetime_filter(rows=10000, repeat=5):
+    '''
+    per-row cost of the datetime filter over one /shows page of rows shows,
+    as the page was rendered before (strftime, then parse and format) and now,
+    with cold caches and on a repeat render
+    '''
+    start_times = [start_time for start_time, in
+                   db.session.query(Show.start_time).order_by(Show.start_time, Show.id).limit(rows)]
+    variants = [
+        ('legacy', lambda: [legacy_format_datetime(value.strftime('%Y-%m-%d %H:%M:%S'), 'full') for value in start_times], None),
+        ('cold', lambda: [format_datetime(value, 'full') for value in start_times],
+         lambda: (format_datetime_cached.cache_clear(), datetime_pattern.cache_clear())),
+        ('warm', lambda: [format_datetime(value, 'full') for value in start_times], None),
+    ]
+    for name, render, reset in variants:
+        timings = []
+        for _ in range(repeat):
+            if reset:
+                reset()
+            start = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - start) * 1e6 / len(start_times))
+        print('%-10s %-40s rows=%-5d median=%8.2fus/row' % (
+            'datetime', name, len(start_times), statistics.median(timings)))
+
+
+SCENARIOS = {
+    'venues': ['/venues', '/venues?genre=Jazz&state=CA'],
+    'artists': ['/artists', '/artists?genre=Jazz&genre=Blues'],
+    'shows': ['/shows', deep_shows_page],
+    'detail': ['/venues/1', '/artists/1'],
+}
+
+MICROBENCHMARKS = {
+    'datetime_filter': datetime_filter,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fyyur page benchmarks')
+    parser.add_argument('scenarios', nargs='*', default=sorted(SCENARIOS),
+                        help='any of %s' % ', '.join(sorted(SCENARIOS) + sorted(MICROBENCHMARKS)))
+    parser.add_argument('--database-url', default='postgresql://localhost:5432/fyyur_bench')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--reseed', action='store_true')
+    parser.add_argument('--cache', action='store_true', help='keep the rendered-page cache enabled')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS) - set(MICROBENCHMARKS)
+    if unknown:
+        parser.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    app.config['DEBUG'] = False
+    if not args.cache:
+        app.config['CACHE_BACKEND'] = None
+
+    with app.app_context():
+        if args.reseed or not db.engine.has_table(Venue.__tablename__) \
+                or Venue.query.count() == 0:
+            start = time.perf_counter()
+            seed(args.venues, args.artists, args.shows)
+            print('seeded %d venues, %d artists, %d shows in %.1fs' % (
+                args.venues, args.artists, args.shows, time.perf_counter() - start))
+
+        client = app.test_client()
+        for name in args.scenarios:
+            if name in MICROBENCHMARKS:
+                MICROBENCHMARKS[name]()
+                continue
+            for url in SCENARIOS[name]:
+                if callable(url):
+                    url = url()
+                result = measure(client, url, args.repeat)
+                print('%-10s %-40s queries=%-5g median=%8.1fms  p95=%8.1fms' % (
+                    name, url[:40], result['queries'], result['median_ms'], result['p95_ms']))
+
+
+if __name__ == '__main__':
+    main()
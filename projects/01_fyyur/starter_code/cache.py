@@ -0,0 +1,192 @@
+'''
+cache.py
+    rendered-page cache with entity-based invalidation
+
+    EXAMPLE
+        page_cache = PageCache(app)
+
+        @app.route('/venues/<int:venue_id>')
+        @page_cache.cached('venue:{venue_id}', 'artists')
+        def show_venue(venue_id): ...
+
+        page_cache.invalidate('venue:%d' % venue_id, 'venues')
+
+    A page is cached under its path and query string together with the current
+    generation of every tag it depends on. Invalidating a tag bumps its
+    generation, so every page built from the old data stops being addressable
+    at once and simply ages out of the backend; nothing has to enumerate keys.
+
+    Backends are chosen with the CACHE_BACKEND config value: 'memory' (an LRU
+    with TTL inside the process), 'redis' (any Redis-compatible server at
+    CACHE_REDIS_URL, needs the redis package) or None to disable caching.
+'''
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request, session
+
+
+class LRUCache(object):
+    '''
+    LRUCache(max_entries, ttl)
+        in-process page store: least recently used pages are evicted past
+        max_entries and pages expire ttl seconds after being stored
+    '''
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._pages = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._pages[key]
+                return None
+            self._pages.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._pages[key] = (time.monotonic() + self.ttl, value)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def generations(self, tags):
+        # generations live outside the LRU: evicting one would reset it and
+        # make pages built from older data addressable again
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._generations.clear()
+
+
+class RedisCache(object):
+    '''
+    RedisCache(url, ttl)
+        page store on a Redis-compatible server; pages are stored with SETEX,
+        tag generations are persistent INCR counters read with one MGET
+    '''
+    def __init__(self, url, ttl=60, prefix='fyyur:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + 'page:' + key)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + 'page:' + key, self.ttl, value)
+
+    def generations(self, tags):
+        values = self.client.mget([self.prefix + 'gen:' + tag for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'gen:' + tag)
+        pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class PageCache(object):
+    '''
+    PageCache(app)
+        caches successful GET responses of decorated views and counts
+        hits, misses and invalidations
+    '''
+    def __init__(self, app):
+        self.app = app
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = self.app.config
+            name = config.get('CACHE_BACKEND')
+            if name == 'memory':
+                self._backend = LRUCache(config.get('CACHE_MAX_ENTRIES', 1024), config.get('CACHE_TTL', 60))
+            elif name == 'redis':
+                self._backend = RedisCache(config['CACHE_REDIS_URL'], config.get('CACHE_TTL', 60))
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.app.config.get('CACHE_BACKEND'),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'invalidations': self.invalidations,
+        }
+
+    def invalidate(self, *tags):
+        if self.backend is not None:
+            self.backend.bump(tags)
+            self.invalidations += 1
+
+    def cached(self, *tag_patterns):
+        '''
+        cached(*tag_patterns)
+            tag_patterns are formatted with the view's arguments,
+            e.g. 'venue:{venue_id}'
+        '''
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                backend = self.backend
+                # pages rendered while flash messages are pending belong to one visitor
+                if backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return f(*args, **kwargs)
+
+                tags = [pattern.format(**kwargs) for pattern in tag_patterns]
+                generations = backend.generations(tags)
+                key = '%s?%s|%s' % (request.path, request.query_string.decode(),
+                                    ','.join('%s=%d' % pair for pair in zip(tags, generations)))
+                body = backend.get(key)
+                if body is not None:
+                    self.hits += 1
+                    response = Response(body, mimetype='text/html')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                response = self.app.make_response(f(*args, **kwargs))
+                if response.status_code == 200 and not session.get('_flashes'):
+                    backend.set(key, response.get_data())
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
@@ -12,3 +12,18 @@ DEBUG = True
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://rohan.joshi_@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# psycopg2 sends executemany() batches (bulk import, counter updates) as
+# multi-row VALUES statements instead of one round trip per row
+SQLALCHEMY_ENGINE_OPTIONS = {'executemany_mode': 'values'}
+
+# Full-text search backend for venues and artists: 'postgresql' or 'memory'
+SEARCH_BACKEND = 'postgresql'
+
+# Rows per page of the /venues, /artists and /shows listings
+ITEMS_PER_PAGE = 50
+
+# Rendered-page cache: 'memory', 'redis' or None to disable
+CACHE_BACKEND = 'memory'
+CACHE_TTL = 60
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = 'redis://localhost:6379/0'
@@ -0,0 +1,68 @@
+'''
+export.py
+    streaming serializers for bulk exports
+
+    EXAMPLE
+        rows = connection.execution_options(stream_results=True).execute(select)
+        return Response(stream_with_context(ndjson_lines(rows, rows.keys())),
+                        mimetype='application/x-ndjson')
+
+    Rows are pulled from the result in fixed-size chunks and written out as
+    they arrive, so with a server-side cursor an export holds one chunk in
+    memory whatever the number of rows.
+'''
+import csv
+import io
+import json
+from datetime import datetime
+
+CHUNK_SIZE = 1000
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def chunks(result, size=CHUNK_SIZE):
+    while True:
+        rows = result.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+
+def ndjson_lines(result, columns):
+    '''
+    ndjson_lines(result, columns)
+        one JSON object per row, a chunk of lines per yielded string
+    '''
+    for rows in chunks(result):
+        yield ''.join(
+            json.dumps({column: _to_json(value) for column, value in zip(columns, row)}) + '\n'
+            for row in rows
+        )
+
+
+def csv_lines(result, columns):
+    '''
+    csv_lines(result, columns)
+        a header row, then a chunk of CSV rows per yielded string
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks(result):
+        writer.writerows([_to_json(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
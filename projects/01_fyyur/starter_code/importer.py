@@ -0,0 +1,270 @@
+'''
+importer.py
+    bulk import of venues, artists and shows from CSV or NDJSON files
+
+    $ export FLASK_APP=app
+    $ flask import-data venues venues.csv
+    $ flask import-data shows shows.ndjson --batch-size 5000 --rejects rejects.ndjson
+
+    Records are streamed from the file, validated with the forms in forms.py
+    and inserted in batches, one transaction per batch. Every batch commits
+    together with the file's ImportCheckpoint row, so an interrupted import
+    picks up after the last committed batch when it is run again.
+
+    CSV files have a header row named after the form fields; genres are comma
+    separated inside their cell. NDJSON files hold one object per line. Show
+    start times use the form's format, e.g. 2035-04-01 20:00:00.
+'''
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+from app import db, page_cache, record_upcoming_shows, Venue, Artist, Show, ImportCheckpoint
+from forms import VenueForm, ArtistForm, ShowForm
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+
+
+def read_csv(f):
+    for row in csv.DictReader(f):
+        yield row
+
+
+'''
+Unreadable
+    stands in for an NDJSON line that does not hold a JSON object, so it is
+    rejected and counted like any other record and a resumed import moves
+    past it instead of failing on it again
+    line: its line number in the file
+    text: the line as read
+    error: why it was not read
+'''
+Unreadable = namedtuple('Unreadable', ['line', 'text', 'error'])
+
+
+def read_ndjson(f):
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield Unreadable(number, line, 'Not valid JSON.')
+            continue
+        if isinstance(record, dict):
+            yield record
+        else:
+            yield Unreadable(number, line, 'Expected a JSON object.')
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def to_formdata(record, list_fields=('genres',), bool_fields=()):
+    '''
+    to_formdata(record)
+        a MultiDict the forms can validate, from one CSV or NDJSON record
+    '''
+    formdata = MultiDict()
+    for key, value in record.items():
+        if value is None:
+            continue
+        if key in bool_fields:
+            if value is True or str(value).strip().lower() in TRUE_VALUES:
+                formdata.add(key, 'y')
+        elif key in list_fields:
+            values = value if isinstance(value, list) else str(value).split(',')
+            for item in values:
+                if str(item).strip():
+                    formdata.add(key, str(item).strip())
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+class EntityImport(object):
+    '''
+    EntityImport
+        validates records of one kind with its form and inserts them
+    '''
+    bool_fields = ()
+
+    def __init__(self):
+        self.form = self.form_class(formdata=None, meta={'csrf': False})
+
+    def validate(self, record):
+        '''returns (row, None) for a valid record or (None, errors)'''
+        self.form.process(formdata=to_formdata(record, bool_fields=self.bool_fields))
+        if not self.form.validate():
+            return None, self.form.errors
+        return self.form.data, None
+
+    def check_batch(self, rows):
+        '''returns {index: errors} for rows that fail checks spanning the batch'''
+        return {}
+
+    def insert(self, rows):
+        db.session.execute(self.model.__table__.insert(), rows)
+
+    def cache_tags(self, rows):
+        '''page cache tags to invalidate once the batch holding rows is committed'''
+        return []
+
+
+class VenueImport(EntityImport):
+    model = Venue
+    form_class = VenueForm
+    bool_fields = ('seeking_talent',)
+
+
+class ArtistImport(EntityImport):
+    model = Artist
+    form_class = ArtistForm
+    bool_fields = ('seeking_venue',)
+
+
+class ShowImport(EntityImport):
+    model = Show
+    form_class = ShowForm
+
+    def validate(self, row):
+        # the form would fall back to its default start time of today
+        if not row.get('start_time'):
+            return None, {'start_time': ['This field is required.']}
+        data, errors = super(ShowImport, self).validate(row)
+        if errors:
+            return None, errors
+        try:
+            data['artist_id'] = int(data['artist_id'])
+            data['venue_id'] = int(data['venue_id'])
+        except (TypeError, ValueError):
+            return None, {'id': ['artist_id and venue_id must be integers.']}
+        return data, None
+
+    def check_batch(self, rows):
+        # one lookup per table for the whole batch instead of per row
+        venue_ids = {row['venue_id'] for row in rows}
+        artist_ids = {row['artist_id'] for row in rows}
+        venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+        artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+        errors = {}
+        for index, row in enumerate(rows):
+            if row['venue_id'] not in venues:
+                errors[index] = {'venue_id': ['Venue %d does not exist.' % row['venue_id']]}
+            elif row['artist_id'] not in artists:
+                errors[index] = {'artist_id': ['Artist %d does not exist.' % row['artist_id']]}
+        return errors
+
+    def insert(self, rows):
+        super(ShowImport, self).insert(rows)
+        record_upcoming_shows([(row['venue_id'], row['artist_id'], row['start_time']) for row in rows])
+
+    def cache_tags(self, rows):
+        tags = ['shows']
+        tags += ['venue:%d' % id for id in {row['venue_id'] for row in rows}]
+        tags += ['artist:%d' % id for id in {row['artist_id'] for row in rows}]
+        return tags
+
+
+IMPORTS = {
+    'venues': VenueImport,
+    'artists': ArtistImport,
+    'shows': ShowImport,
+}
+
+
+def import_file(kind, path, file_format=None, batch_size=1000, restart=False, rejects=None, out=sys.stdout):
+    '''
+    import_file(kind, path)
+        imports one file and returns the checkpoint totals
+        kind: 'venues', 'artists' or 'shows'
+        file_format: 'csv' or 'ndjson', by default taken from the file extension
+        restart: ignore a previous checkpoint for this file
+        rejects: writable file receiving one JSON line per rejected record
+    '''
+    importer = IMPORTS[kind]()
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    reader = READERS[file_format]
+
+    source = '%s:%s' % (kind, os.path.abspath(path))
+    checkpoint = ImportCheckpoint.query.filter_by(source=source).one_or_none()
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(source=source, records=0, inserted=0, rejected=0)
+        db.session.add(checkpoint)
+        db.session.commit()
+    elif restart:
+        checkpoint.records = checkpoint.inserted = checkpoint.rejected = 0
+        db.session.commit()
+    skip = checkpoint.records
+    if skip:
+        out.write('resuming %s after record %d\n' % (path, skip))
+
+    start = time.perf_counter()
+    inserted = rejected = 0
+    with open(path, newline='') as f:
+        records = islice(reader(f), skip, None)
+        position = skip
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            rows, invalid = [], []
+            for offset, record in enumerate(batch):
+                if isinstance(record, Unreadable):
+                    row, errors = None, {'record': [record.error]}
+                else:
+                    row, errors = importer.validate(record)
+                if errors:
+                    invalid.append((position + offset + 1, record, errors))
+                else:
+                    rows.append((position + offset + 1, row))
+            batch_errors = importer.check_batch([row for _, row in rows])
+            for index in sorted(batch_errors):
+                number, row = rows[index]
+                invalid.append((number, batch[number - position - 1], batch_errors[index]))
+            rows = [row for index, (_, row) in enumerate(rows) if index not in batch_errors]
+
+            try:
+                if rows:
+                    importer.insert(rows)
+                position += len(batch)
+                checkpoint.records = position
+                checkpoint.inserted += len(rows)
+                checkpoint.rejected += len(invalid)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            # like the views, only after the commit: a request in between
+            # would otherwise cache the old page under the new generation
+            if rows:
+                page_cache.invalidate(*importer.cache_tags(rows))
+            inserted += len(rows)
+            rejected += len(invalid)
+
+            if rejects is not None:
+                for number, record, errors in sorted(invalid, key=lambda item: item[0]):
+                    reject = {'record': number, 'errors': errors, 'data': record}
+                    if isinstance(record, Unreadable):
+                        reject.update(line=record.line, data=record.text)
+                    rejects.write(json.dumps(reject, default=str) + '\n')
+
+    elapsed = time.perf_counter() - start
+    out.write('%s: %d inserted, %d rejected in %.1fs (%.0f records/s)\n' % (
+        kind, inserted, rejected, elapsed, (inserted + rejected) / elapsed if elapsed else 0))
+    return {
+        'records': checkpoint.records,
+        'inserted': checkpoint.inserted,
+        'rejected': checkpoint.rejected,
+        'elapsed': elapsed,
+    }
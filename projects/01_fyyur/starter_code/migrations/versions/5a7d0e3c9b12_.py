@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: 5a7d0e3c9b12
+Revises: c4e19a6b2f07
+Create Date: 2026-10-18 12:20:05.117342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7d0e3c9b12'
+down_revision = 'c4e19a6b2f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_state_city_name_id', 'venue', ['state', 'city', 'name', 'id'], unique=False)
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+    op.drop_index('ix_venue_state_city_name_id', table_name='venue')
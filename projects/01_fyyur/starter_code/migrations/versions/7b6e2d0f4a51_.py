@@ -0,0 +1,33 @@
+"""import checkpoints
+
+Revision ID: 7b6e2d0f4a51
+Revises: e2a94f6c1d38
+Create Date: 2026-10-18 14:55:30.241977
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b6e2d0f4a51'
+down_revision = 'e2a94f6c1d38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=1000), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.Column('inserted', sa.Integer(), nullable=False),
+    sa.Column('rejected', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('import_checkpoint')
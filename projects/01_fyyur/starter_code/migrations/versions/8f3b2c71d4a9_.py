@@ -0,0 +1,28 @@
+"""show and venue listing indexes
+
+Revision ID: 8f3b2c71d4a9
+Revises: 51d2554254d6
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b2c71d4a9'
+down_revision = '51d2554254d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
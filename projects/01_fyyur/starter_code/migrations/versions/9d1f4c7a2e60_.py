@@ -0,0 +1,42 @@
+"""genre arrays on artist, GIN indexes on genres
+
+Revision ID: 9d1f4c7a2e60
+Revises: 7b6e2d0f4a51
+Create Date: 2026-10-18 15:12:48.306217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1f4c7a2e60'
+down_revision = '7b6e2d0f4a51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # artist.genres was created as a varchar holding an array literal like
+    # '{Jazz,"Rock n Roll"}' or a bare genre; turn it into the array the model declares
+    columns = {column['name']: column for column in sa.inspect(op.get_bind()).get_columns('artist')}
+    if not isinstance(columns['genres']['type'], sa.ARRAY):
+        op.execute(
+            "ALTER TABLE artist ALTER COLUMN genres TYPE varchar[] USING "
+            "CASE WHEN genres IS NULL OR btrim(genres) = '' THEN NULL "
+            "WHEN genres LIKE '{%}' THEN genres::varchar[] "
+            "ELSE ARRAY[genres]::varchar[] END")
+    for table in ('venue', 'artist'):
+        # drop blank entries and stray whitespace left by the web forms
+        op.execute(
+            "UPDATE {0} SET genres = ARRAY("
+            "SELECT btrim(genre) FROM unnest(genres) WITH ORDINALITY AS g(genre, n) "
+            "WHERE btrim(genre) <> '' ORDER BY n) "
+            "WHERE genres IS NOT NULL".format(table))
+        op.create_index('ix_{0}_genres'.format(table), table, ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{0}_genres'.format(table), table_name=table)
+    op.alter_column('artist', 'genres', type_=sa.String(length=120), postgresql_using='genres::varchar(120)')
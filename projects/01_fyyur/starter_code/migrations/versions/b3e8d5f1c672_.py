@@ -0,0 +1,38 @@
+"""venue and artist name, city and state NOT NULL
+
+Revision ID: b3e8d5f1c672
+Revises: 9d1f4c7a2e60
+Create Date: 2026-10-18 16:40:12.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8d5f1c672'
+down_revision = '9d1f4c7a2e60'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ('venue', 'name', sa.String()),
+    ('venue', 'city', sa.String(length=120)),
+    ('venue', 'state', sa.String(length=120)),
+    ('artist', 'name', sa.String()),
+    ('artist', 'city', sa.String(length=120)),
+    ('artist', 'state', sa.String(length=120)),
+)
+
+
+def upgrade():
+    # the listing pages seek on these columns with row-value comparisons,
+    # which never match a NULL; the forms always required them
+    for table, column, type_ in COLUMNS:
+        op.execute("UPDATE {0} SET {1} = '' WHERE {1} IS NULL".format(table, column))
+        op.alter_column(table, column, existing_type=type_, nullable=False)
+
+
+def downgrade():
+    for table, column, type_ in COLUMNS:
+        op.alter_column(table, column, existing_type=type_, nullable=True)
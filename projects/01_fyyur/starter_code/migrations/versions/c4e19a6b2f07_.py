@@ -0,0 +1,36 @@
+"""full-text search vectors on venue and artist
+
+Revision ID: c4e19a6b2f07
+Revises: 8f3b2c71d4a9
+Create Date: 2026-10-18 11:02:17.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e19a6b2f07'
+down_revision = '8f3b2c71d4a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(
+            "CREATE TRIGGER {0}_search_vector_update "
+            "BEFORE INSERT OR UPDATE ON {0} "
+            "FOR EACH ROW EXECUTE PROCEDURE "
+            "tsvector_update_trigger(search_vector, 'pg_catalog.simple', name)".format(table))
+        op.execute("UPDATE {0} SET search_vector = to_tsvector('pg_catalog.simple', coalesce(name, ''))".format(table))
+        op.create_index('ix_{0}_search_vector'.format(table), table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{0}_search_vector'.format(table), table_name=table)
+        op.execute("DROP TRIGGER {0}_search_vector_update ON {0}".format(table))
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,36 @@
+"""upcoming show counters on venue and artist
+
+Revision ID: e2a94f6c1d38
+Revises: 5a7d0e3c9b12
+Create Date: 2026-10-18 13:41:52.660819
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a94f6c1d38'
+down_revision = '5a7d0e3c9b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f('ix_{0}_next_show_at'.format(table)), table, ['next_show_at'], unique=False)
+        op.execute(
+            "UPDATE {0} SET "
+            "upcoming_show_count = (SELECT count(show.id) FROM show "
+            "WHERE show.{0}_id = {0}.id AND show.start_time > LOCALTIMESTAMP), "
+            "next_show_at = (SELECT min(show.start_time) FROM show "
+            "WHERE show.{0}_id = {0}.id AND show.start_time > LOCALTIMESTAMP)".format(table))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(op.f('ix_{0}_next_show_at'.format(table)), table_name=table)
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'upcoming_show_count')
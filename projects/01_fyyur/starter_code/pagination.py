@@ -0,0 +1,104 @@
+'''
+pagination.py
+    keyset (seek) pagination for listing pages
+
+    Rows are ordered by a unique sort key, e.g. (start_time, id), and a page is
+    fetched with "WHERE (start_time, id) > (:last_start_time, :last_id) LIMIT n",
+    which an index on the same columns answers without scanning the rows of
+    earlier pages the way OFFSET does.
+
+    EXAMPLE
+        page = paginate(db.session.query(Show.id, Show.start_time),
+                        (Show.start_time, Show.id), request.args.get('cursor'))
+        page.items, page.next_cursor, page.prev_cursor
+'''
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+'''
+Page
+    items: rows of the page, in sort key order
+    next_cursor / prev_cursor: opaque cursors for the neighbouring pages, or None
+'''
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+AFTER = 'a'
+BEFORE = 'b'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _from_json(column, value):
+    if value is not None and column.type.python_type is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_cursor(direction, key):
+    payload = json.dumps([direction] + [_to_json(value) for value in key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, key = payload[0], payload[1:]
+        if direction not in (AFTER, BEFORE) or len(key) != len(columns):
+            raise InvalidCursor(cursor)
+        return direction, [_from_json(column, value) for column, value in zip(columns, key)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, IndexError):
+        raise InvalidCursor(cursor)
+
+
+def paginate(query, columns, cursor=None, per_page=50):
+    '''
+    paginate(query, columns, cursor, per_page)
+        query: query whose rows expose an attribute for each sort column
+        columns: the unique sort key, backed by an index in the same order;
+            the columns must be NOT NULL, as a row-value comparison with a
+            NULL is never true and rows holding one would drop out of the pages
+        cursor: a cursor from a previous Page, or None for the first page
+        raises InvalidCursor when the cursor cannot be decoded
+    '''
+    direction, key = AFTER, None
+    if cursor:
+        direction, key = decode_cursor(cursor, columns)
+
+    sort_key = tuple_(*columns)
+    if direction == AFTER:
+        if key is not None:
+            query = query.filter(sort_key > tuple_(*key))
+        query = query.order_by(*columns)
+    else:
+        query = query.filter(sort_key < tuple_(*key))
+        query = query.order_by(*[column.desc() for column in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == BEFORE:
+        rows.reverse()
+
+    def row_key(row):
+        return [getattr(row, column.key) for column in columns]
+
+    has_next = has_more if direction == AFTER else True
+    has_prev = key is not None if direction == AFTER else has_more
+    return Page(
+        rows,
+        encode_cursor(AFTER, row_key(rows[-1])) if rows and has_next else None,
+        encode_cursor(BEFORE, row_key(rows[0])) if rows and has_prev else None
+    )
@@ -0,0 +1,207 @@
+'''
+search.py
+    full-text search over named entities (venues, artists) behind a pluggable backend
+
+    EXAMPLE
+        search = FullTextSearch(db)
+        search.register(Venue)
+        match = search.match(Venue, 'blue not')
+        Venue.query.filter(match.criterion).order_by(*match.order_by)
+
+    Every search term is matched as a word prefix and all terms must match.
+    The 'postgresql' backend queries a trigger-maintained tsvector column through
+    a GIN index. The 'memory' backend keeps an inverted index inside the process
+    so the same API works on databases without full-text support (e.g. tests).
+'''
+import re
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from sqlalchemy import DDL, case, event, false, func, true
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+'''
+SearchMatch
+    criterion: filter selecting the matching rows
+    order_by: clauses sorting the most relevant rows first
+'''
+SearchMatch = namedtuple('SearchMatch', ['criterion', 'order_by'])
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def search_vector_ddl(tablename):
+    '''
+    search_vector_ddl(tablename)
+        trigger keeping the table's search_vector in sync with its name column
+    '''
+    return DDL(
+        "CREATE TRIGGER %(table)s_search_vector_update "
+        "BEFORE INSERT OR UPDATE ON %(table)s "
+        "FOR EACH ROW EXECUTE PROCEDURE "
+        "tsvector_update_trigger(search_vector, 'pg_catalog.simple', name)"
+        % {'table': tablename}).execute_if(dialect='postgresql')
+
+
+class InvertedIndex(object):
+    '''
+    InvertedIndex
+        maps tokens to the documents containing them; the sorted vocabulary
+        lets a prefix be resolved with two binary searches
+    '''
+    def __init__(self):
+        self._postings = {}
+        self._documents = {}
+        self._vocabulary = []
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        tokens = tokenize(text)
+        self._documents[doc_id] = tokens
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def remove(self, doc_id):
+        for token in set(self._documents.pop(doc_id, ())):
+            postings = self._postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def _expand(self, prefix):
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + '\uffff', start)
+        return self._vocabulary[start:end]
+
+    def search(self, terms):
+        '''
+        search(terms)
+            returns {doc_id: score} for documents matching every term as a prefix;
+            whole-word hits score higher than prefix hits
+        '''
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token in self._expand(term):
+                weight = 1.0 if token == term else 0.5
+                for doc_id, count in self._postings[token].items():
+                    length = len(self._documents[doc_id])
+                    term_scores[doc_id] = term_scores.get(doc_id, 0) + weight * count / length
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc_id: score + term_scores[doc_id]
+                          for doc_id, score in scores.items() if doc_id in term_scores}
+            if not scores:
+                break
+        return scores or {}
+
+
+class PostgresSearchBackend(object):
+    '''
+    PostgresSearchBackend
+        ranks rows with ts_rank over the model's search_vector column
+    '''
+    def __init__(self, db):
+        self.db = db
+
+    def match(self, model, terms):
+        query = func.to_tsquery('simple', ' & '.join(term + ':*' for term in terms))
+        return SearchMatch(
+            model.search_vector.op('@@', is_comparison=True)(query),
+            (func.ts_rank(model.search_vector, query).desc(),)
+        )
+
+    def add(self, model, target):
+        pass
+
+    def remove(self, model, target):
+        pass
+
+
+class InMemorySearchBackend(object):
+    '''
+    InMemorySearchBackend
+        builds one InvertedIndex per model from the database on first use and
+        keeps it current from the registered models' mapper events
+    '''
+    def __init__(self, db):
+        self.db = db
+        self._indexes = {}
+
+    def _index(self, model):
+        index = self._indexes.get(model)
+        if index is None:
+            index = InvertedIndex()
+            for doc_id, name in self.db.session.query(model.id, model.name):
+                index.add(doc_id, name)
+            self._indexes[model] = index
+        return index
+
+    def match(self, model, terms):
+        scores = self._index(model).search(terms)
+        if not scores:
+            return SearchMatch(false(), ())
+        return SearchMatch(
+            model.id.in_(scores),
+            (case(scores, value=model.id, else_=0).desc(),)
+        )
+
+    def add(self, model, target):
+        if model in self._indexes:
+            self._indexes[model].add(target.id, target.name)
+
+    def remove(self, model, target):
+        if model in self._indexes:
+            self._indexes[model].remove(target.id)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'memory': InMemorySearchBackend,
+}
+
+
+class FullTextSearch(object):
+    '''
+    FullTextSearch(db)
+        entry point used by the views; the backend is chosen from the
+        SEARCH_BACKEND config value the first time it is needed
+    '''
+    def __init__(self, db, backend=None):
+        self.db = db
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            name = self.db.get_app().config.get('SEARCH_BACKEND', 'postgresql')
+            self._backend = BACKENDS[name](self.db)
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+
+    def register(self, model):
+        event.listen(model.__table__, 'after_create', search_vector_ddl(model.__tablename__))
+        event.listen(model, 'after_insert', lambda mapper, connection, target: self.backend.add(model, target))
+        event.listen(model, 'after_update', lambda mapper, connection, target: self.backend.add(model, target))
+        event.listen(model, 'after_delete', lambda mapper, connection, target: self.backend.remove(model, target))
+
+    def match(self, model, search_term):
+        terms = tokenize(search_term)
+        if not terms:
+            return SearchMatch(true(), ())
+        return self.backend.match(model, terms)
@@ -0,0 +1,544 @@
+import babel.dates
+import html
+import io
+import json
+import os
+import re
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db, format_datetime, format_datetime_cached, page_cache, search, sweep_upcoming_shows, Venue, Artist, Show, ImportCheckpoint
+from benchmark import QueryCounter
+from cache import LRUCache
+from importer import import_file
+from search import InvertedIndex, InMemorySearchBackend, PostgresSearchBackend
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and seed a fresh test database."""
+        self.database_name = "fyyur_test"
+        self.database_path = "postgresql://{}/{}".format('localhost:5432', self.database_name)
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.database_path
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['ITEMS_PER_PAGE'] = 2
+        self.client = app.test_client
+        search.backend = PostgresSearchBackend(db)
+        page_cache.backend = LRUCache()
+
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            hop = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+            park = Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA', genres=['Folk'])
+            dueling = Venue(name='The Dueling Pianos Bar', city='New York', state='NY', genres=['Classical'])
+            artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+            db.session.add_all([hop, park, dueling, artist])
+            db.session.commit()
+            now = datetime.now()
+            db.session.add_all([
+                Show(venue_id=hop.id, artist_id=artist.id, start_time=now - timedelta(days=7)),
+                Show(venue_id=hop.id, artist_id=artist.id, start_time=now + timedelta(days=7)),
+                Show(venue_id=dueling.id, artist_id=artist.id, start_time=now + timedelta(days=1)),
+            ])
+            db.session.commit()
+            sweep_upcoming_shows(rebuild=True)
+            self.ids = {venue.name: venue.id for venue in Venue.query.all()}
+            self.artist_id = artist.id
+
+    def tearDown(self):
+        """Executed after reach test"""
+        search.backend = None
+        app.config['ITEMS_PER_PAGE'] = 50
+
+    def walk_pages(self, url, item_pattern):
+        """Follows next links from the first page, then prev links back."""
+        forward, backward = [], []
+        for direction, pages in (('next', forward), ('previous', backward)):
+            while True:
+                res = self.client().get(url)
+                self.assertEqual(res.status_code, 200)
+                pages.append(re.findall(item_pattern, res.data))
+                link = re.search(rb'<li class="%s"><a href="([^"]+)"' % direction.encode(), res.data)
+                if link is None:
+                    break
+                url = html.unescape(link.group(1).decode())
+        backward.reverse()
+        return forward, backward
+
+    def search_names(self, url, search_term):
+        res = self.client().post(url, data={'search_term': search_term})
+        self.assertEqual(res.status_code, 200)
+        return [name.decode() for name in re.findall(rb'<h5>(.*)</h5>', res.data)]
+
+    def test_search_venues_prefix(self):
+        self.assertEqual(sorted(self.search_names('/venues/search', 'mus')),
+                         ['Park Square Live Music &amp; Coffee', 'The Musical Hop'])
+
+    def test_search_venues_all_terms_must_match(self):
+        self.assertEqual(self.search_names('/venues/search', 'the pian'), ['The Dueling Pianos Bar'])
+
+    def test_search_venues_empty_term_lists_all(self):
+        self.assertEqual(len(self.search_names('/venues/search', '')), 3)
+
+    def test_search_venues_no_match(self):
+        self.assertEqual(self.search_names('/venues/search', 'zzz'), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search_names('/venues/search', "hop & | ! :*"), ['The Musical Hop'])
+
+    def test_search_artists(self):
+        self.assertEqual(self.search_names('/artists/search', 'petal'), ['Guns N Petals'])
+
+    def test_search_vector_follows_renames(self):
+        with app.app_context():
+            venue = Venue.query.get(self.ids['The Dueling Pianos Bar'])
+            venue.name = 'The Musical Duel'
+            db.session.commit()
+        self.assertEqual(len(self.search_names('/venues/search', 'musical')), 2)
+
+    def test_in_memory_backend_matches_postgres(self):
+        expected = self.search_names('/venues/search', 'the')
+        search.backend = InMemorySearchBackend(db)
+        self.assertEqual(sorted(self.search_names('/venues/search', 'the')), sorted(expected))
+        self.assertEqual(self.search_names('/venues/search', 'the pian'), ['The Dueling Pianos Bar'])
+
+    def test_in_memory_backend_tracks_writes(self):
+        search.backend = InMemorySearchBackend(db)
+        self.assertEqual(self.search_names('/venues/search', 'street'), [])
+        with app.app_context():
+            venue = Venue.query.get(self.ids['The Dueling Pianos Bar'])
+            venue.name = 'Duel Street'
+            db.session.commit()
+        self.assertEqual(self.search_names('/venues/search', 'street'), ['Duel Street'])
+        self.assertEqual(self.search_names('/venues/search', 'pianos'), [])
+
+    def test_artists_keyset_pages(self):
+        with app.app_context():
+            db.session.add_all([Artist(name=name, city='Austin', state='TX', genres=['Jazz']) for name in ('Ava', 'Bo', 'Bo', 'Cy')])
+            db.session.commit()
+        forward, backward = self.walk_pages('/artists', rb'<h5>(.*)</h5>')
+        self.assertEqual(forward, [[b'Ava', b'Bo'], [b'Bo', b'Cy'], [b'Guns N Petals']])
+        self.assertEqual(backward, forward)
+
+    def test_listing_sort_columns_not_null(self):
+        # a NULL in a keyset sort column would never compare greater than a cursor
+        for model in (Venue, Artist):
+            for column in (model.name, model.city, model.state):
+                self.assertFalse(column.nullable, column)
+        with app.app_context():
+            db.session.add(Venue(name='Nowhere', state='CA', genres=['Jazz']))
+            with self.assertRaises(IntegrityError):
+                db.session.commit()
+            db.session.rollback()
+
+    def test_venues_keyset_pages_keep_area_grouping(self):
+        forward, backward = self.walk_pages('/venues', rb'<h3>(.*)</h3>|<h5>(.*)</h5>')
+        self.assertEqual(forward, [
+            [(b'San Francisco, CA', b''), (b'', b'Park Square Live Music &amp; Coffee'), (b'', b'The Musical Hop')],
+            [(b'New York, NY', b''), (b'', b'The Dueling Pianos Bar')],
+        ])
+        self.assertEqual(backward, forward)
+
+    def listing_names(self, url):
+        res = self.client().get(url)
+        self.assertEqual(res.status_code, 200)
+        return [name.decode() for name in re.findall(rb'<h5>(.*)</h5>', res.data)]
+
+    def test_filter_venues_by_genre_and_state(self):
+        self.assertEqual(self.listing_names('/venues?genre=Jazz&state=CA'), ['The Musical Hop'])
+        self.assertEqual(self.listing_names('/venues?genre=Jazz&state=NY'), [])
+        self.assertEqual(self.listing_names('/venues?genre=Jazz&genre=Folk'), [])
+        # blank fields of the filter form match everything
+        self.assertEqual(self.listing_names('/venues?genre=&state=&city='), self.listing_names('/venues'))
+
+    def test_filter_venues_seeking_talent(self):
+        with app.app_context():
+            Venue.query.get(self.ids['The Dueling Pianos Bar']).seeking_talent = True
+            db.session.commit()
+        self.assertEqual(self.listing_names('/venues?seeking=1'), ['The Dueling Pianos Bar'])
+
+    def test_filtered_pages_keep_filters(self):
+        with app.app_context():
+            db.session.add_all([Venue(name=name, city='Austin', state='TX', genres=['Jazz', 'Blues']) for name in ('Antone', 'Elephant Room')])
+            db.session.commit()
+        forward, backward = self.walk_pages('/venues?genre=Jazz', rb'<h5>(.*)</h5>')
+        self.assertEqual(forward, [[b'The Musical Hop', b'Antone'], [b'Elephant Room']])
+        self.assertEqual(backward, forward)
+
+    def test_filter_artists_by_genre(self):
+        with app.app_context():
+            db.session.add(Artist(name='Ava', city='Austin', state='TX', genres=['Jazz', 'Rock n Roll']))
+            db.session.commit()
+        self.assertEqual(self.listing_names('/artists?genre=Rock+n+Roll'), ['Ava', 'Guns N Petals'])
+        self.assertEqual(self.listing_names('/artists?genre=Rock+n+Roll&state=TX'), ['Ava'])
+
+    def test_show_artist_lists_every_genre(self):
+        with app.app_context():
+            Artist.query.get(self.artist_id).genres = ['Rock n Roll', 'Jazz']
+            db.session.commit()
+        res = self.client().get('/artists/%d' % self.artist_id)
+        self.assertIn(b'>Rock n Roll</a>', res.data)
+        self.assertIn(b'>Jazz</a>', res.data)
+
+    def test_shows_keyset_pages(self):
+        forward, backward = self.walk_pages('/shows', rb'<h5><a href="/venues/(\d+)">')
+        self.assertEqual([len(page) for page in forward], [2, 1])
+        self.assertEqual(backward, forward)
+
+    def test_400_invalid_cursor(self):
+        for cursor in ('garbage', 'WyJ4IiwxXQ', 'WyJhIl0'):
+            res = self.client().get('/shows?cursor=' + cursor)
+            self.assertEqual(res.status_code, 400)
+
+    def get_counting_statements(self, url):
+        with app.app_context():
+            with QueryCounter(db.engine) as counter:
+                res = self.client().get(url)
+        return res, counter.count
+
+    def test_show_venue_single_statement(self):
+        res, statements = self.get_counting_statements('/venues/%d' % self.ids['The Musical Hop'])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(statements, 1)
+        self.assertIn(b'1 Upcoming Show<', res.data)
+        self.assertIn(b'1 Past Show<', res.data)
+        self.assertIn(b'Guns N Petals', res.data)
+
+    def test_show_venue_without_shows(self):
+        res, statements = self.get_counting_statements('/venues/%d' % self.ids['Park Square Live Music & Coffee'])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(statements, 1)
+        self.assertIn(b'0 Upcoming Shows', res.data)
+        self.assertIn(b'0 Past Shows', res.data)
+
+    def test_show_artist_single_statement(self):
+        res, statements = self.get_counting_statements('/artists/%d' % self.artist_id)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(statements, 1)
+        self.assertIn(b'2 Upcoming Shows', res.data)
+        self.assertIn(b'1 Past Show<', res.data)
+        self.assertIn(b'The Dueling Pianos Bar', res.data)
+
+    def test_404_show_venue_and_artist(self):
+        self.assertEqual(self.client().get('/venues/1000').status_code, 404)
+        self.assertEqual(self.client().get('/artists/1000').status_code, 404)
+
+    def counters(self, model, entity_id):
+        with app.app_context():
+            entity = model.query.get(entity_id)
+            return entity.upcoming_show_count, entity.next_show_at
+
+    def test_counters_rebuilt(self):
+        self.assertEqual(self.counters(Venue, self.ids['The Musical Hop'])[0], 1)
+        self.assertEqual(self.counters(Venue, self.ids['Park Square Live Music & Coffee']), (0, None))
+        self.assertEqual(self.counters(Artist, self.artist_id)[0], 2)
+
+    def test_create_show_updates_counters(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        start_time = (datetime.now() + timedelta(days=3)).replace(microsecond=0)
+        res = self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': self.artist_id,
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.counters(Venue, venue_id), (1, start_time))
+        count, next_show_at = self.counters(Artist, self.artist_id)
+        self.assertEqual(count, 3)
+        self.assertLess(next_show_at, start_time)
+
+    def test_create_past_show_leaves_counters(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        res = self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': self.artist_id,
+            'start_time': '2019-05-21 21:30:00'
+        })
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.counters(Venue, venue_id), (0, None))
+
+    def test_sweeper_rolls_counters_forward(self):
+        with app.app_context():
+            self.assertEqual(sweep_upcoming_shows(), 0)
+            self.assertEqual(sweep_upcoming_shows(now=datetime.now() + timedelta(days=3)), 2)
+        self.assertEqual(self.counters(Venue, self.ids['The Dueling Pianos Bar']), (0, None))
+        self.assertEqual(self.counters(Venue, self.ids['The Musical Hop'])[0], 1)
+        self.assertEqual(self.counters(Artist, self.artist_id)[0], 1)
+
+    def test_detail_page_served_from_cache(self):
+        url = '/venues/%d' % self.ids['The Musical Hop']
+        first, _ = self.get_counting_statements(url)
+        second, statements = self.get_counting_statements(url)
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(statements, 0)
+        self.assertEqual(first.data, second.data)
+
+    def test_edit_venue_invalidates_cached_pages(self):
+        venue_id = self.ids['The Dueling Pianos Bar']
+        client = self.client()
+        for url in ('/venues/%d' % venue_id, '/artists/%d' % self.artist_id, '/venues/%d' % self.ids['The Musical Hop']):
+            client.get(url)
+        res = client.post('/venues/%d/edit' % venue_id, data={
+            'name': 'The Dueling Pianos Lounge', 'city': 'New York', 'state': 'NY',
+            'address': '335 Delancey Street', 'phone': '914-003-1132', 'genres': ['Classical'],
+            'image_link': '', 'facebook_link': '', 'website': '', 'seeking_description': ''
+        })
+        self.assertEqual(res.status_code, 302)
+        # the redirected page carries this visitor's flash message and is not cached
+        flashed = client.get('/venues/%d' % venue_id)
+        self.assertIn(b'Venue was successfully updated!', flashed.data)
+        self.assertNotIn('X-Cache', flashed.headers)
+        for url in ('/venues/%d' % venue_id, '/artists/%d' % self.artist_id):
+            res = client.get(url)
+            self.assertEqual(res.headers['X-Cache'], 'MISS')
+            self.assertIn(b'The Dueling Pianos Lounge', res.data)
+            self.assertNotIn(b'Venue was successfully updated!', res.data)
+        self.assertEqual(client.get('/venues/%d' % self.ids['The Musical Hop']).headers['X-Cache'], 'HIT')
+
+    def test_create_show_invalidates_cached_pages(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        other_id = self.ids['The Musical Hop']
+        for url in ('/venues/%d' % venue_id, '/venues/%d' % other_id, '/shows'):
+            self.client().get(url)
+        self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': self.artist_id,
+            'start_time': (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self.assertEqual(self.client().get('/venues/%d' % venue_id).headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client().get('/shows').headers['X-Cache'], 'MISS')
+        self.assertEqual(self.client().get('/venues/%d' % other_id).headers['X-Cache'], 'HIT')
+
+    def test_cache_stats(self):
+        before = json.loads(self.client().get('/cache/stats').data)
+        self.client().get('/shows')
+        self.client().get('/shows')
+        after = json.loads(self.client().get('/cache/stats').data)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_404_not_cached(self):
+        self.client().get('/venues/1000')
+        res = self.client().get('/venues/1000')
+        self.assertEqual(res.status_code, 404)
+        self.assertNotEqual(res.headers.get('X-Cache'), 'HIT')
+
+    def export_shows(self, query=''):
+        res = self.client().get('/shows/export' + query)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_streamed)
+        return res
+
+    def test_export_shows_ndjson(self):
+        res = self.export_shows()
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        shows = [json.loads(line) for line in res.data.decode().splitlines()]
+        self.assertEqual(len(shows), 3)
+        self.assertEqual(shows, sorted(shows, key=lambda show: show['start_time']))
+        self.assertEqual(set(shows[0]), {'id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name'})
+        self.assertEqual(shows[-1]['venue_name'], 'The Musical Hop')
+
+    def test_export_shows_csv_with_filters(self):
+        res = self.export_shows('?format=csv&from=%s&venue_id=%d' % (
+            datetime.now().date(), self.ids['The Musical Hop']))
+        self.assertEqual(res.mimetype, 'text/csv')
+        lines = res.data.decode().splitlines()
+        self.assertEqual(lines[0], 'id,start_time,venue_id,venue_name,artist_id,artist_name')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('The Musical Hop', lines[1])
+
+    def test_export_shows_empty_csv_has_header(self):
+        res = self.export_shows('?format=csv&to=2000-01-01')
+        self.assertEqual(res.data.decode().splitlines(), ['id,start_time,venue_id,venue_name,artist_id,artist_name'])
+
+    def test_400_export_shows_bad_parameters(self):
+        for query in ('?format=xml', '?from=someday', '?venue_id=one'):
+            self.assertEqual(self.client().get('/shows/export' + query).status_code, 400)
+
+    def write_import_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, kind, path, **kwargs):
+        with app.app_context():
+            return import_file(kind, path, out=io.StringIO(), **kwargs)
+
+    def test_import_venues_csv(self):
+        path = self.write_import_file('.csv', (
+            'name,city,state,address,phone,genres,facebook_link,website,seeking_talent\n'
+            'The Blue Note,New York,NY,131 W 3rd St,212-475-8592,"Jazz,Blues",https://facebook.com/bluenote,https://bluenote.net,yes\n'
+            'Nowhere,New York,XX,1 Main St,212-475-8592,Jazz,https://facebook.com/x,https://x.com,no\n'
+        ))
+        rejects = io.StringIO()
+        totals = self.import_file('venues', path, rejects=rejects)
+        self.assertEqual((totals['records'], totals['inserted'], totals['rejected']), (2, 1, 1))
+        with app.app_context():
+            venue = Venue.query.filter_by(name='The Blue Note').one()
+            self.assertEqual(venue.genres, ['Jazz', 'Blues'])
+            self.assertTrue(venue.seeking_talent)
+        self.assertIn('The Blue Note', self.search_names('/venues/search', 'blue'))
+        rejected = [json.loads(line) for line in rejects.getvalue().splitlines()]
+        self.assertEqual([(r['record'], list(r['errors'])) for r in rejected], [(2, ['state'])])
+
+    def test_import_shows_ndjson_updates_counters(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        start_time = (datetime.now() + timedelta(days=3)).replace(microsecond=0)
+        lines = [
+            {'venue_id': venue_id, 'artist_id': self.artist_id, 'start_time': str(start_time)},
+            {'venue_id': venue_id, 'artist_id': self.artist_id, 'start_time': '2019-05-21 21:30:00'},
+            {'venue_id': 1000, 'artist_id': self.artist_id, 'start_time': str(start_time)},
+            {'venue_id': venue_id, 'artist_id': self.artist_id},
+        ]
+        path = self.write_import_file('.ndjson', ''.join(json.dumps(line) + '\n' for line in lines))
+        self.client().get('/venues/%d' % venue_id)
+        totals = self.import_file('shows', path)
+        self.assertEqual((totals['inserted'], totals['rejected']), (2, 2))
+        self.assertEqual(self.counters(Venue, venue_id), (1, start_time))
+        self.assertEqual(self.counters(Artist, self.artist_id)[0], 3)
+        self.assertEqual(self.client().get('/venues/%d' % venue_id).headers['X-Cache'], 'MISS')
+
+    def test_import_resumes_after_last_batch(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        path = self.write_import_file('.csv', 'venue_id,artist_id,start_time\n' + ''.join(
+            '%d,%d,2035-01-%02d 20:00:00\n' % (venue_id, self.artist_id, day) for day in range(1, 6)))
+        # an earlier run committed the first two records before stopping
+        with app.app_context():
+            db.session.add(ImportCheckpoint(source='shows:' + os.path.abspath(path), records=2, inserted=2, rejected=0))
+            db.session.commit()
+        totals = self.import_file('shows', path, batch_size=2)
+        self.assertEqual((totals['records'], totals['inserted']), (5, 5))
+        self.assertEqual(self.counters(Venue, venue_id), (3, datetime(2035, 1, 3, 20)))
+        # a finished file imports nothing more unless restarted
+        self.assertEqual(self.import_file('shows', path)['inserted'], 5)
+        self.assertEqual(self.counters(Venue, venue_id)[0], 3)
+        self.assertEqual(self.import_file('shows', path, restart=True)['inserted'], 5)
+        self.assertEqual(self.counters(Venue, venue_id)[0], 8)
+
+    def test_import_rejects_unreadable_lines_and_resumes(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        show = json.dumps({'venue_id': venue_id, 'artist_id': self.artist_id, 'start_time': '2035-01-01 20:00:00'})
+        path = self.write_import_file('.ndjson', show + '\n{"venue_id": \n\n[1, 2]\n' + show + '\n')
+        rejects = io.StringIO()
+        totals = self.import_file('shows', path, batch_size=2, rejects=rejects)
+        self.assertEqual((totals['records'], totals['inserted'], totals['rejected']), (4, 2, 2))
+        rejected = [json.loads(line) for line in rejects.getvalue().splitlines()]
+        self.assertEqual([(r['record'], r['line'], r['errors'], r['data']) for r in rejected], [
+            (2, 2, {'record': ['Not valid JSON.']}, '{"venue_id":'),
+            (3, 4, {'record': ['Expected a JSON object.']}, '[1, 2]'),
+        ])
+        # the checkpoint moved past them, so running it again does not fail on them
+        self.assertEqual(self.import_file('shows', path)['inserted'], 2)
+        self.assertEqual(self.counters(Venue, venue_id)[0], 2)
+
+    def test_import_invalidates_pages_after_commit(self):
+        venue_id = self.ids['Park Square Live Music & Coffee']
+        path = self.write_import_file('.csv', 'venue_id,artist_id,start_time\n' + ''.join(
+            '%d,%d,2035-01-%02d 20:00:00\n' % (venue_id, self.artist_id, day) for day in range(1, 4)))
+        committed = []
+        invalidate = page_cache.invalidate
+
+        def invalidate_after_commit(*tags):
+            # another connection only sees what the import has committed
+            with db.engine.connect() as connection:
+                committed.append(connection.execute(db.select([db.func.count()]).select_from(Show.__table__)).scalar())
+            return invalidate(*tags)
+
+        page_cache.invalidate = invalidate_after_commit
+        self.addCleanup(delattr, page_cache, 'invalidate')
+        with app.app_context():
+            before = Show.query.count()
+        self.import_file('shows', path, batch_size=2)
+        self.assertEqual(committed, [before + 2, before + 3])
+
+
+class DatetimeFilterTestCase(unittest.TestCase):
+    """The datetime Jinja filter"""
+
+    def test_formats_datetimes_and_strings_alike(self):
+        value = datetime(2019, 5, 21, 21, 30)
+        self.assertEqual(format_datetime(value, 'full'), 'Tuesday May, 21, 2019 at 9:30PM')
+        self.assertEqual(format_datetime('2019-05-21 21:30:00', 'full'), format_datetime(value, 'full'))
+        self.assertEqual(format_datetime(value), 'Tue 05, 21, 2019 9:30PM')
+
+    def test_custom_pattern_and_babel_named_formats(self):
+        value = datetime(2019, 5, 21, 21, 30)
+        self.assertEqual(format_datetime(value, 'yyyy-MM-dd'), '2019-05-21')
+        self.assertEqual(format_datetime(value, 'short', 'en_US'),
+                         babel.dates.format_datetime(value, 'short', locale='en_US'))
+
+    def test_repeated_values_are_memoized(self):
+        format_datetime_cached.cache_clear()
+        for _ in range(3):
+            format_datetime(datetime(2035, 1, 1, 20), 'full')
+        self.assertEqual(format_datetime_cached.cache_info().hits, 2)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """This class represents the in-process page store test case"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        cache.get('a')
+        cache.set('c', b'3')
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertIsNone(cache.get('b'))
+
+    def test_expires_after_ttl(self):
+        cache = LRUCache(ttl=-1)
+        cache.set('a', b'1')
+        self.assertIsNone(cache.get('a'))
+
+    def test_generations_survive_eviction(self):
+        cache = LRUCache(max_entries=1)
+        cache.bump(['venue:1'])
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        self.assertEqual(cache.generations(['venue:1', 'venue:2']), [1, 0])
+
+
+class InvertedIndexTestCase(unittest.TestCase):
+    """This class represents the in-memory search index test case"""
+
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add(1, 'The Musical Hop')
+        self.index.add(2, 'Musicians Corner')
+        self.index.add(3, 'The Dueling Pianos Bar')
+
+    def test_prefix_match(self):
+        self.assertEqual(set(self.index.search(['music'])), {1, 2})
+
+    def test_whole_word_ranks_above_prefix(self):
+        self.index.add(4, 'Hopscotch Hall')
+        scores = self.index.search(['hop'])
+        self.assertGreater(scores[1], scores[4])
+
+    def test_all_terms_required(self):
+        self.assertEqual(set(self.index.search(['the', 'due'])), {3})
+
+    def test_readd_replaces_document(self):
+        self.index.add(3, 'Jazz Cellar')
+        self.assertEqual(self.index.search(['dueling']), {})
+        self.assertEqual(set(self.index.search(['jazz'])), {3})
+
+    def test_remove(self):
+        self.index.remove(1)
+        self.assertEqual(set(self.index.search(['music'])), {2})
+        self.assertEqual(len(self.index), 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
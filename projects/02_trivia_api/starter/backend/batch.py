@@ -0,0 +1,141 @@
+'''
+batch.py
+    deleting and updating many questions with one statement
+
+    EXAMPLE
+        criterion = question_criterion({'filter': {'category': 3, 'search': 'Tom Hanks'}})
+        deleted = delete_questions(criterion)
+        updated = update_questions(question_criterion({'ids': [4, 8]}), {'difficulty': 2})
+
+    A request selects questions either by id or by a filter:
+        {'ids': [4, 8, 15]}
+        {'filter': {'category': 3, 'difficulty': [4, 5], 'search': 'bird'}}
+    Filter conditions are combined with AND; category and difficulty take
+    one value or a list, search matches question or answer text as
+    POST /questions/search does. An empty filter is refused rather than
+    read as "every question".
+
+    On PostgreSQL a batch is a single DELETE or UPDATE ... RETURNING in one
+    transaction, and the returned (id, category) pairs update the category
+    counts, the quiz pool and the in-memory search index once, after the
+    commit. Other databases first select the affected ids.
+'''
+from collections import Counter
+
+from sqlalchemy import and_
+
+from models import db, Question, category_cache, question_pool
+from ingest import MIN_DIFFICULTY, MAX_DIFFICULTY
+from search import contains, question_search
+
+MAX_BATCH_IDS = 10000
+FILTERS = ('category', 'difficulty', 'search')
+UPDATABLE = ('category', 'difficulty')
+
+
+def int_list(value, name):
+    values = value if isinstance(value, list) else [value]
+    try:
+        if not values or any(isinstance(v, bool) for v in values):
+            raise TypeError
+        return [int(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError('%s must be an integer or a list of integers' % name)
+
+
+def question_criterion(body):
+    '''the criterion selected by a request body; ValueError says what is wrong with it'''
+    if not isinstance(body, dict) or ('ids' in body) == ('filter' in body):
+        raise ValueError('expected either ids or filter')
+
+    if 'ids' in body:
+        ids = int_list(body['ids'], 'ids')
+        if len(ids) > MAX_BATCH_IDS:
+            raise ValueError('at most %d ids per request' % MAX_BATCH_IDS)
+        return Question.id.in_(ids)
+
+    spec = body['filter']
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('filter needs at least one of %s' % ', '.join(FILTERS))
+    unknown = set(spec) - set(FILTERS)
+    if unknown:
+        raise ValueError('unknown filter %s' % ', '.join(sorted(unknown)))
+    conditions = []
+    if 'category' in spec:
+        conditions.append(Question.category.in_(int_list(spec['category'], 'category')))
+    if 'difficulty' in spec:
+        conditions.append(Question.difficulty.in_(int_list(spec['difficulty'], 'difficulty')))
+    if 'search' in spec:
+        if not isinstance(spec['search'], str) or not spec['search']:
+            raise ValueError('search must be a non-empty string')
+        conditions.append(contains(spec['search']))
+    return and_(*conditions)
+
+
+def changes(body, categories):
+    '''the validated columns to set, from the request's 'set' object'''
+    values = body.get('set') if isinstance(body, dict) else None
+    if not isinstance(values, dict) or not values or set(values) - set(UPDATABLE):
+        raise ValueError('set takes %s' % ' and/or '.join(UPDATABLE))
+    result = {}
+    for name, value in values.items():
+        try:
+            if isinstance(value, bool):
+                raise TypeError
+            result[name] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError('%s must be an integer' % name)
+    if 'category' in result and result['category'] not in categories:
+        raise ValueError('unknown category %d' % result['category'])
+    if 'difficulty' in result and not MIN_DIFFICULTY <= result['difficulty'] <= MAX_DIFFICULTY:
+        raise ValueError('difficulty must be from %d to %d' % (MIN_DIFFICULTY, MAX_DIFFICULTY))
+    return result
+
+
+def returning_supported():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def delete_questions(criterion):
+    '''deletes the matching questions and returns how many there were'''
+    table = Question.__table__
+    if returning_supported():
+        deleted = db.session.execute(
+            table.delete().where(criterion).returning(table.c.id, table.c.category)).fetchall()
+    else:
+        deleted = db.session.execute(db.select([table.c.id, table.c.category]).where(criterion)).fetchall()
+        if deleted:
+            db.session.execute(table.delete().where(table.c.id.in_([row[0] for row in deleted])))
+    db.session.commit()
+
+    category_cache.adjust_many({category: -count for category, count in Counter(row[1] for row in deleted).items()})
+    question_pool.removed_many(deleted)
+    for question_id, _ in deleted:
+        question_search.removed(question_id)
+    return len(deleted)
+
+
+def update_questions(criterion, values):
+    '''sets values on the matching questions and returns how many there were'''
+    table = Question.__table__
+    if returning_supported():
+        # the old categories come from the FROM item, read before the update
+        old = db.select([table.c.id, table.c.category]).where(criterion).with_for_update().alias('old')
+        updated = db.session.execute(
+            table.update().where(table.c.id == old.c.id).values(**values).returning(
+                table.c.id, old.c.category)).fetchall()
+    else:
+        updated = db.session.execute(db.select([table.c.id, table.c.category]).where(criterion)).fetchall()
+        if updated:
+            db.session.execute(table.update().where(
+                table.c.id.in_([row[0] for row in updated])).values(**values))
+    db.session.commit()
+
+    if 'category' in values:
+        moved = [(question_id, category) for question_id, category in updated if category != values['category']]
+        deltas = Counter(category for _, category in moved)
+        deltas = {category: -count for category, count in deltas.items()}
+        deltas[values['category']] = deltas.get(values['category'], 0) + len(moved)
+        category_cache.adjust_many(deltas)
+        question_pool.moved_many(moved, values['category'])
+    return len(updated)
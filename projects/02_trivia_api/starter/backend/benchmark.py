@@ -0,0 +1,132 @@
+'''
+benchmark.py
+    seeds a scratch database with many questions and reports how long
+    GET /questions takes for pages near the start, middle and end,
+    GET /categories/<id>/questions, POST /quizzes and a quiz session for
+    a quiz in progress, and POST /questions/search for rare and common terms
+
+    $ createdb trivia_bench
+    $ python benchmark.py --database-url postgresql://localhost:5432/trivia_bench --questions 1000000
+
+    Pages are fetched both by number (?page=, LIMIT/OFFSET) and by the id
+    they start after (?after=, keyset).
+
+    !!NOTE the questions and categories tables are emptied and refilled when
+    --reseed is given or when they hold fewer than --questions rows
+'''
+import argparse
+import os
+import statistics
+import time
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+
+
+def seed(db, num_questions):
+    db.session.execute('TRUNCATE questions, categories RESTART IDENTITY')
+    db.session.execute(
+        'INSERT INTO categories (type) SELECT unnest(CAST(:types AS text[]))', {'types': CATEGORIES})
+    db.session.execute(
+        "INSERT INTO questions (question, answer, difficulty, category) "
+        "SELECT 'Question ' || n, 'Answer ' || n, 1 + n % 5, 1 + n % 6 "
+        "FROM generate_series(1, :n) AS n", {'n': num_questions})
+    db.session.commit()
+    # merges the search index's pending entries, which would otherwise be
+    # scanned one by one until autovacuum gets to them
+    with db.engine.connect() as connection:
+        connection.execution_options(isolation_level='AUTOCOMMIT').execute('VACUUM ANALYZE questions')
+
+
+def timed(client, url, repeat, json=None):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = client.post(url, json=json) if json is not None else client.get(url)
+        timings.append(time.perf_counter() - start)
+        if res.status_code != 200:
+            raise SystemExit('%s answered %d' % (url, res.status_code))
+    return timings
+
+
+# (label, term): matched by one question, by a few hundred and by a tenth of them all
+SEARCH_TERMS = [('rare', '987654'), ('some', '4242'), ('common', 'answer 1')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trivia /questions pagination benchmark')
+    parser.add_argument('--database-url', default='postgresql://localhost:5432/trivia_bench')
+    parser.add_argument('--questions', type=int, default=1000000)
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--reseed', action='store_true')
+    args = parser.parse_args()
+
+    # models reads the database URL when it is imported
+    os.environ['DATABASE_URL'] = args.database_url
+    from flaskr import create_app
+    from models import db, Question
+
+    app = create_app({'QUESTIONS_PER_PAGE': args.per_page})
+    with app.app_context():
+        if args.reseed or Question.query.count() < args.questions:
+            start = time.perf_counter()
+            seed(db, args.questions)
+            print('seeded %d questions in %.1fs' % (args.questions, time.perf_counter() - start))
+        ids = [row[0] for row in db.session.query(Question.id).order_by(Question.id)]
+
+    client = app.test_client()
+    # the first request loads the cached counts and categories
+    client.get('/questions')
+    last_page = (len(ids) - 1) // args.per_page + 1
+    for label, page in (('first', 1), ('quarter', last_page // 4), ('middle', last_page // 2),
+                        ('last', last_page)):
+        page = max(page, 1)
+        after = ids[(page - 1) * args.per_page - 1] if page > 1 else 0
+        for mode, url in (('page', '/questions?page=%d' % page), ('after', '/questions?after=%d' % after)):
+            timings = timed(client, url, args.repeat)
+            print('%-8s page=%-7d %-6s median=%7.2fms  p95=%7.2fms' % (
+                label, page, mode, statistics.median(timings) * 1000,
+                sorted(timings)[int(len(timings) * 0.95) - 1] * 1000))
+
+    with app.app_context():
+        in_category = [row[0] for row in db.session.query(Question.id).filter(
+            Question.category == 3).order_by(Question.id)]
+    last_page = (len(in_category) - 1) // args.per_page + 1
+    for label, page in (('first', 1), ('last', last_page)):
+        after = in_category[(page - 1) * args.per_page - 1] if page > 1 else 0
+        for mode, url in (('page', '/categories/3/questions?page=%d' % page),
+                          ('after', '/categories/3/questions?after=%d' % after)):
+            timings = timed(client, url, args.repeat)
+            print('category %-5s page=%-6d %-6s median=%7.2fms  p95=%7.2fms' % (
+                label, page, mode, statistics.median(timings) * 1000,
+                sorted(timings)[int(len(timings) * 0.95) - 1] * 1000))
+
+    for category in (0, 3):
+        quiz = {'quiz_category': {'id': category}, 'previous_questions': ids[:4]}
+        # the first pick of a category loads its question ids
+        start = time.perf_counter()
+        client.post('/quizzes', json=quiz)
+        loaded = time.perf_counter() - start
+        timings = timed(client, '/quizzes', args.repeat, json=quiz)
+        print('quiz     category=%-3d load=%7.0fms   median=%7.2fms  p95=%7.2fms' % (
+            category, loaded * 1000, statistics.median(timings) * 1000,
+            sorted(timings)[int(len(timings) * 0.95) - 1] * 1000))
+
+        res = client.post('/quizzes/sessions', json={'quiz_category': {'id': category},
+                                                     'length': min(args.repeat + 1, 100)})
+        url = '/quizzes/sessions/%s/next' % res.get_json()['session_id']
+        timings = timed(client, url, min(args.repeat, 99), json={})
+        print('session  category=%-3d                median=%7.2fms  p95=%7.2fms' % (
+            category, statistics.median(timings) * 1000,
+            sorted(timings)[int(len(timings) * 0.95) - 1] * 1000))
+
+    for label, term in SEARCH_TERMS:
+        res = client.post('/questions/search', json={'searchTerm': term})
+        timings = timed(client, '/questions/search', args.repeat, json={'searchTerm': term})
+        print('search   %-6s matches=%-7d     median=%7.2fms  p95=%7.2fms' % (
+            label, res.get_json()['total_questions'], statistics.median(timings) * 1000,
+            sorted(timings)[int(len(timings) * 0.95) - 1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,61 @@
 import os
+import click
 from flask import Flask, request, abort, jsonify
 from flask_cors import CORS
-import random
 from flask_sqlalchemy import SQLAlchemy
 
-from models import setup_db, Question, Category
+from models import setup_db, Question, Category, category_cache, question_pool
+from quiz_sessions import SessionNotFound, make_store
+from search import question_search
+from ingest import BATCH_SIZE, ingest
+from batch import question_criterion, changes, delete_questions, update_questions
 
 QUESTIONS_PER_PAGE = 10
-
-
-def paginate_questions(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
-
-    return current_questions
+MAX_QUESTIONS_PER_PAGE = 100
+# questions in a quiz session unless the request asks for another length
+QUIZ_LENGTH = 5
+MAX_QUIZ_LENGTH = 100
+MAX_BULK_BATCH_SIZE = 10000
+
+
+def page_size(request, default):
+    '''the per_page request argument, bounded to 1..MAX_QUESTIONS_PER_PAGE'''
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, MAX_QUESTIONS_PER_PAGE))
+
+
+def paginate_questions(request, query, per_page=QUESTIONS_PER_PAGE):
+    '''
+    paginate_questions(request, query, per_page)
+        formats one page of query, ordered by id and cut in SQL
+        ?page=<n> counts pages from the first question (LIMIT/OFFSET, so deep
+            pages cost more as the database skips the rows before them)
+        ?after=<id> starts after a question id (keyset, every page costs the same)
+    '''
+    query = query.order_by(Question.id)
+    after = request.args.get('after', None, type=int)
+    if after is not None:
+        query = query.filter(Question.id > after)
+    else:
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            return []
+        query = query.offset((page - 1) * per_page)
+
+    return [question.format() for question in query.limit(per_page)]
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
+    app.config['QUESTIONS_PER_PAGE'] = QUESTIONS_PER_PAGE
+    app.config['QUIZ_LENGTH'] = QUIZ_LENGTH
+    if test_config is not None:
+        app.config.update(test_config)
     setup_db(app)
+    question_search.init_app(app)
     CORS(app)
+    quiz_sessions = app.extensions['quiz_sessions'] = make_store(app.config)
 
 # CORS Headers
 
@@ -38,22 +69,20 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def retrieve_categories():
-            categories = Category.query.all()
+            categories = category_cache.categories()
 
             if len(categories) == 0:
                 abort(404)
 
             return jsonify({
                 'success': True,
-                'categories': {category.id: category.type for category in categories}
+                'categories': categories
             })
 
     @app.route('/questions')
     def retrieve_questions():
-                selection = Question.query.order_by(Question.id).all()
-                current_questions = paginate_questions(request, selection)
-
-                categories = Category.query.order_by(Category.type).all()
+                per_page = page_size(request, app.config['QUESTIONS_PER_PAGE'])
+                current_questions = paginate_questions(request, Question.query, per_page)
 
                 if len(current_questions) == 0:
                     abort(404)
@@ -61,10 +90,11 @@ def create_app(test_config=None):
                 return jsonify({
                     'success': True,
                     'questions': current_questions,
-                    'total_questions': len(selection),
-                    'categories': {category.id: category.type
-                                   for category in categories},
-                    'current_category': None
+                    'total_questions': category_cache.total_questions(),
+                    'categories': category_cache.categories(),
+                    'current_category': None,
+                    # pass as ?after= to fetch the next page by keyset
+                    'next_after': current_questions[-1]['id'] if len(current_questions) == per_page else None
                 })
 
     @app.route('/questions/<int:question_id>', methods=['DELETE'])
@@ -76,16 +106,43 @@ def create_app(test_config=None):
                 if question is None:
                     abort(404)
 
-                    question.delete()
+                question.delete()
 
-                    return jsonify({
-                        'success': True,
-                        'deleted': question_id
-                    })
+                return jsonify({
+                    'success': True,
+                    'deleted': question_id
+                })
 
             except:
                 abort(422)
 
+    @app.route('/questions', methods=['DELETE'])
+    def delete_questions_batch():
+                try:
+                    criterion = question_criterion(request.get_json())
+                except ValueError:
+                    abort(422)
+
+                return jsonify({
+                    'success': True,
+                    'deleted': delete_questions(criterion),
+                    'total_questions': category_cache.total_questions()
+                })
+
+    @app.route('/questions', methods=['PATCH'])
+    def update_questions_batch():
+                body = request.get_json()
+                try:
+                    criterion = question_criterion(body)
+                    values = changes(body, category_cache.categories())
+                except ValueError:
+                    abort(422)
+
+                return jsonify({
+                    'success': True,
+                    'updated': update_questions(criterion, values)
+                })
+
     @app.route('/questions', methods=['POST'])
     def create_question():
                 body = request.get_json()
@@ -105,7 +162,7 @@ def create_app(test_config=None):
                     question = Question(
                                         question=new_question, answer=new_answer,
                                         difficulty=new_difficulty,
-                                        category=new_category)
+                                        category=int(new_category))
                     question.insert()
 
                     return jsonify({
@@ -116,20 +173,51 @@ def create_app(test_config=None):
                 except:
                     abort(422)
 
+    @app.route('/questions/bulk', methods=['POST'])
+    def bulk_create_questions():
+                batch_size = request.args.get('batch_size', BATCH_SIZE, type=int)
+                if not 1 <= batch_size <= MAX_BULK_BATCH_SIZE:
+                    abort(422)
+
+                # NDJSON is read line by line as it arrives, never held whole
+                report = ingest(request.stream, batch_size)
+                if not report['batches']:
+                    abort(400)
+
+                return jsonify(dict(report, success=report['rejected'] == 0 and report['failed'] == 0))
+
+    @app.cli.command('import-questions')
+    @click.argument('pack', type=click.File('rb'))
+    @click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+    def import_questions(pack, batch_size):
+        '''Imports questions from an NDJSON file, - for stdin.'''
+        report = ingest(pack, batch_size)
+        for batch in report['batches']:
+            click.echo('batch %d (lines %d-%d): %s, %d inserted, %d duplicates, %d rejected' % (
+                batch['batch'], batch['first_line'], batch['last_line'],
+                'committed' if batch['committed'] else 'rolled back: ' + batch['error'],
+                batch['inserted'], batch['duplicates'], len(batch['errors'])))
+            for error in batch['errors']:
+                click.echo('  line %d: %s' % (error['line'], error['error']))
+        click.echo('%d inserted, %d duplicates, %d rejected, %d failed' % (
+            report['inserted'], report['duplicates'], report['rejected'], report['failed']))
+
     @app.route('/questions/search', methods=['POST'])
     def search_questions():
             body = request.get_json()
             search_term = body.get('searchTerm', None)
 
             if search_term:
-                questions = Question.query.filter(
-                    Question.question.ilike(f'%{search_term}%')).all()
+                per_page = page_size(request, app.config['QUESTIONS_PER_PAGE'])
+                page = max(request.args.get('page', 1, type=int), 1)
+                questions, total_questions = question_search.search(
+                    search_term, offset=(page - 1) * per_page, limit=per_page)
                 if questions:
 
                         return jsonify({
                             'success': True,
                             'questions': [question.format() for question in questions],
-                            'total_questions': len(questions),
+                            'total_questions': total_questions,
                             'current_category': None
                         })
                 else:
@@ -140,18 +228,19 @@ def create_app(test_config=None):
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
     def retrieve_questions_by_category(category_id):
                 try:
-                    category = Category.query.filter_by(id=category_id).one_or_none()
-
-                    if (category is None):
+                    if category_id not in category_cache.categories():
                         abort(400)
 
-                    questions = Question.query.filter_by(category=category.id).all()
+                    per_page = page_size(request, app.config['QUESTIONS_PER_PAGE'])
+                    questions = paginate_questions(
+                        request, Question.query.filter(Question.category == category_id), per_page)
 
                     return jsonify({
                             'success': True,
-                            'questions': [question.format() for question in questions],
-                            'total_questions': len(questions),
-                            'current_category': category_id
+                            'questions': questions,
+                            'total_questions': category_cache.total_questions(category_id),
+                            'current_category': category_id,
+                            'next_after': questions[-1]['id'] if len(questions) == per_page else None
                     })
                 except:
                     abort(404)
@@ -166,39 +255,97 @@ def create_app(test_config=None):
                     category = body.get('quiz_category')
                     previous_questions = body.get('previous_questions')
 
-                    print(category['id'])
-                    category_id = int(category['id'])
-                    if (category['id'] == 0):
-                        questions = Question.query.all()
-                    else:
-                        questions = Question.query.filter_by(category=category['id']).all()
+                    try:
+                        category_id = int(category['id'])
+                        previous_questions = {int(question_id) for question_id in previous_questions}
+                    except (KeyError, TypeError, ValueError):
+                        abort(422)
 
-                    all = len(questions)
+                    question = pick_quiz_question(category_id, previous_questions)
 
-                    def get_random_question():
-                        return questions[random.randrange(0, len(questions), 1)]
+                    # every question of the category has been asked
+                    if question is None:
+                        return jsonify({
+                            'success': True
+                        })
 
-                    def check_if_used(question):
-                        used = False
-                        for q in previous_questions:
-                            if (q == question.id):
-                                used = True
+                    return jsonify({
+                        'success': True,
+                        'question': question.format()
+                    })
 
-                        return used
+    def pick_quiz_question(category_id, previous_questions):
+        # the pool may still hold ids deleted by another process
+        while True:
+            question_id = question_pool.pick(category_id, previous_questions)
+            if question_id is None:
+                return None
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+            question_pool.discard(question_id)
+
+    def next_quiz_question(session_id):
+        # skips questions deleted since the deck was drawn
+        while True:
+            question_id = quiz_sessions.pop(session_id)
+            if question_id is None:
+                return None
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz_session():
+                    body = request.get_json() or {}
+
+                    try:
+                        category_id = int(body['quiz_category']['id'])
+                        length = int(body.get('length', app.config['QUIZ_LENGTH']))
+                    except (KeyError, TypeError, ValueError):
+                        abort(422)
+                    if not 1 <= length <= MAX_QUIZ_LENGTH:
+                        abort(422)
+                    if category_id != 0 and category_id not in category_cache.categories():
+                        abort(404)
+
+                    session_id = quiz_sessions.create(question_pool.sample(category_id, length))
+                    question = next_quiz_question(session_id)
+
+                    return jsonify({
+                        'success': True,
+                        'session_id': session_id,
+                        'question': question.format() if question else None
+                    })
 
-                    rand = get_random_question()
+    @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+    def next_quiz_session_question(session_id):
+                    try:
+                        question = next_quiz_question(session_id)
+                    except SessionNotFound:
+                        abort(404)
 
-                    while (check_if_used(rand)):
-                        rand = get_random_question()
+                    # the deck is used up
+                    if question is None:
+                        return jsonify({
+                            'success': True
+                        })
+
+                    return jsonify({
+                        'success': True,
+                        'question': question.format()
+                    })
 
-                        if (len(previous_questions) == all):
-                            return jsonify({
-                                'success': True
-                            })
+    @app.route('/quizzes/sessions/<session_id>', methods=['DELETE'])
+    def end_quiz_session(session_id):
+                    try:
+                        quiz_sessions.delete(session_id)
+                    except SessionNotFound:
+                        abort(404)
 
                     return jsonify({
                         'success': True,
-                        'question': rand.format()
+                        'deleted': session_id
                     })
 
     @app.errorhandler(404)
@@ -0,0 +1,145 @@
+'''
+ingest.py
+    bulk import of questions from NDJSON, one JSON object per line
+
+    EXAMPLE
+        with open('pack.ndjson', 'rb') as lines:
+            report = ingest(lines, batch_size=1000)
+
+    Every line holds {"question": ..., "answer": ..., "category": <id>,
+    "difficulty": <1-5>}. Lines are read batch_size at a time; the valid ones
+    of a batch are inserted with a single multi-row INSERT and committed
+    together. A question whose text is already stored, or came earlier in
+    the stream, is skipped as a duplicate; the stored texts are looked up
+    once per batch through the hash index on questions.question.
+
+    A batch that cannot be inserted is rolled back and reported, and the
+    import goes on with the next one, so a report says exactly which lines
+    were stored:
+
+        {'inserted': 1998, 'duplicates': 1, 'rejected': 1, 'failed': 0,
+         'batches': [{'batch': 1, 'first_line': 1, 'last_line': 1000,
+                      'inserted': 998, 'duplicates': 1, 'committed': True,
+                      'errors': [{'line': 17, 'error': 'unknown category 9'}]},
+                     ...]}
+'''
+import json
+from collections import Counter
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Question, category_cache, question_pool
+from search import question_search
+
+BATCH_SIZE = 1000
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+
+def validate(item, categories):
+    '''the row to insert for one decoded line; ValueError says why there is none'''
+    if not isinstance(item, dict):
+        raise ValueError('expected a JSON object')
+    row = {}
+    for field in ('question', 'answer'):
+        value = item.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError('%s must be a non-empty string' % field)
+        row[field] = value.strip()
+    try:
+        row['category'] = int(item.get('category'))
+    except (TypeError, ValueError):
+        raise ValueError('category must be a category id')
+    if row['category'] not in categories:
+        raise ValueError('unknown category %d' % row['category'])
+    try:
+        row['difficulty'] = int(item.get('difficulty'))
+    except (TypeError, ValueError):
+        raise ValueError('difficulty must be an integer')
+    if not MIN_DIFFICULTY <= row['difficulty'] <= MAX_DIFFICULTY:
+        raise ValueError('difficulty must be from %d to %d' % (MIN_DIFFICULTY, MAX_DIFFICULTY))
+    return row
+
+
+def insert_rows(rows):
+    '''inserts rows in the current transaction and returns their ids'''
+    table = Question.__table__
+    if db.engine.dialect.name == 'postgresql':
+        result = db.session.execute(table.insert().values(rows).returning(table.c.id))
+        return [question_id for question_id, in result]
+    return [db.session.execute(table.insert().values(row)).inserted_primary_key[0] for row in rows]
+
+
+def ingest_batch(number, lines, categories, seen):
+    entry = {'batch': number, 'first_line': lines[0][0], 'last_line': lines[-1][0],
+             'inserted': 0, 'duplicates': 0, 'committed': False, 'errors': []}
+    rows = []
+    for line_number, line in lines:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            entry['errors'].append({'line': line_number, 'error': 'not valid JSON'})
+            continue
+        try:
+            rows.append(validate(item, categories))
+        except ValueError as e:
+            entry['errors'].append({'line': line_number, 'error': str(e)})
+
+    texts = {row['question'] for row in rows}
+    stored = {text for text, in db.session.query(Question.question).filter(Question.question.in_(texts))} if texts else set()
+    new_rows = []
+    for row in rows:
+        if row['question'] in stored or row['question'] in seen:
+            entry['duplicates'] += 1
+        else:
+            stored.add(row['question'])
+            new_rows.append(row)
+
+    try:
+        ids = insert_rows(new_rows) if new_rows else []
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        entry['error'] = str(e.orig if getattr(e, 'orig', None) is not None else e)
+        entry['failed'] = len(new_rows)
+        return entry
+
+    entry['committed'] = True
+    entry['inserted'] = len(ids)
+    seen.update(row['question'] for row in new_rows)
+    category_cache.adjust_many(Counter(row['category'] for row in new_rows))
+    for question_id, row in zip(ids, new_rows):
+        question_pool.added(question_id, row['category'])
+        question_search.added(question_id, row['question'], row['answer'])
+    return entry
+
+
+def ingest(lines, batch_size=BATCH_SIZE):
+    '''
+    ingest(lines, batch_size)
+        lines: an iterable of NDJSON lines (str or bytes), e.g. an open file
+        returns the report described above; blank lines are skipped
+    '''
+    categories = category_cache.categories()
+    report = {'inserted': 0, 'duplicates': 0, 'rejected': 0, 'failed': 0, 'batches': []}
+    seen = set()
+    batch = []
+
+    def flush():
+        entry = ingest_batch(len(report['batches']) + 1, batch, categories, seen)
+        report['batches'].append(entry)
+        report['inserted'] += entry['inserted']
+        report['duplicates'] += entry['duplicates']
+        report['rejected'] += len(entry['errors'])
+        report['failed'] += entry.get('failed', 0)
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) == batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return report
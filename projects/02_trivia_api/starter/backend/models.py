@@ -1,10 +1,15 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import random
+import threading
+import time
+import warnings
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine, exc, func, inspect
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 # database_name = "trivia"
 # database_path = "postgres://rohan.joshi_".format('localhost:5432', database_name)
+database_path = os.environ.get('DATABASE_URL', 'postgresql://rohan.joshi_@localhost:5432/trivia')
 
 db = SQLAlchemy()
 
@@ -12,13 +17,253 @@ db = SQLAlchemy()
 setup_db(app)
     binds a flask application and a SQLAlchemy service
 '''
-# def setup_db(app, database_path=database_path):
-def setup_db(app):
-    app.config["SQLALCHEMY_DATABASE_URI"] = 'postgresql://rohan.joshi_@localhost:5432/trivia'
+def setup_db(app, database_path=database_path):
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.app = app
     db.init_app(app)
     db.create_all()
+    db_upgrade()
+
+'''
+db_upgrade()
+    brings a database created from an earlier version of the models up to
+    date: questions.category becomes an integer foreign key to categories,
+    and category listings get their (category, id) index
+'''
+def db_upgrade():
+    inspector = inspect(db.engine)
+    if db.engine.dialect.name == 'postgresql':
+        columns = {column['name']: column for column in inspector.get_columns('questions')}
+        if not isinstance(columns['category']['type'], Integer):
+            db.session.execute('ALTER TABLE questions ALTER COLUMN category TYPE integer USING category::integer')
+        if not inspector.get_foreign_keys('questions'):
+            # NOT VALID: rows written before the constraint existed are not checked
+            db.session.execute(
+                'ALTER TABLE questions ADD CONSTRAINT category FOREIGN KEY (category) '
+                'REFERENCES categories (id) ON UPDATE CASCADE ON DELETE SET NULL NOT VALID')
+        db.session.commit()
+    with warnings.catch_warnings():
+        # expression indexes, like search's trigram index, are not reflected
+        warnings.simplefilter('ignore', exc.SAWarning)
+        indexes = [index['name'] for index in inspector.get_indexes('questions')]
+    for index in Question.__table__.indexes:
+        if index.name not in indexes:
+            index.create(db.engine)
+
+'''
+CategoryCache(max_age)
+    the category map and the number of questions in each category, loaded
+    with two queries on first use and then served from memory
+
+    categories() -> {id: type}, ordered by type
+    question_counts() -> {category id: number of questions}
+
+    Question.insert(), update() and delete() adjust the counts of this
+    process as they commit; invalidate() drops everything, e.g. after
+    categories were edited in the database, and both are reloaded after
+    max_age seconds so changes made by other processes show up eventually.
+'''
+class CategoryCache(object):
+  def __init__(self, max_age=300, clock=time.monotonic):
+    self.max_age = max_age
+    self.clock = clock
+    self.loads = 0
+    self._categories = None
+    self._counts = None
+    self._loaded_at = None
+    self._lock = threading.Lock()
+
+  def _load(self):
+    now = self.clock()
+    if self._categories is not None and now - self._loaded_at < self.max_age:
+      return
+    categories = Category.query.order_by(Category.type).all()
+    counts = db.session.query(Question.category, func.count(Question.id)).group_by(Question.category).all()
+    self._categories = {category.id: category.type for category in categories}
+    self._counts = {category: count for category, count in counts if category is not None}
+    self._loaded_at = now
+    self.loads += 1
+
+  def categories(self):
+    with self._lock:
+      self._load()
+      return self._categories
+
+  def question_counts(self):
+    with self._lock:
+      self._load()
+      return dict(self._counts)
+
+  def total_questions(self, category=None):
+    with self._lock:
+      self._load()
+      if category is None:
+        return sum(self._counts.values())
+      return self._counts.get(int(category), 0)
+
+  def adjust(self, category, delta):
+    if category is None:
+      return
+    with self._lock:
+      if self._counts is not None:
+        category = int(category)
+        self._counts[category] = self._counts.get(category, 0) + delta
+
+  def adjust_many(self, deltas):
+    '''applies {category: delta} at once, e.g. for a batch of questions'''
+    with self._lock:
+      if self._counts is not None:
+        for category, delta in deltas.items():
+          if category is not None:
+            self._counts[int(category)] = self._counts.get(int(category), 0) + delta
+
+  def invalidate(self):
+    with self._lock:
+      self._categories = None
+      self._counts = None
+
+
+category_cache = CategoryCache()
+
+'''
+QuestionPool(tries, max_age)
+    the question ids of each category, kept in memory to pick quiz questions
+
+    pick(category, previous) -> a random id of the category (0 for all
+    categories) that is not in previous, or None once all were asked
+    sample(category, count) -> a shuffled deck of up to count ids
+
+    Each category is loaded with one query on first use into a list plus a
+    {id: position} index, so Question.insert() and delete() add or remove an
+    id in constant time. pick() draws up to `tries` random ids; if all of
+    them were asked already it walks the list from a random position and
+    takes the first id not asked yet, which takes at most len(previous) + 1
+    steps. Either way a pick never depends on the size of the category.
+
+    Like CategoryCache, a category is reloaded once it is max_age seconds
+    old, so questions added or deleted by other processes show up
+    eventually; discard() drops an id the database no longer has.
+'''
+class QuestionPool(object):
+  ALL = 0
+
+  def __init__(self, tries=8, max_age=300, rng=random, clock=time.monotonic):
+    self.tries = tries
+    self.max_age = max_age
+    self.rng = rng
+    self.clock = clock
+    self._ids = {}
+    self._positions = {}
+    self._loaded_at = {}
+    self._lock = threading.Lock()
+
+  def _load(self, category):
+    now = self.clock()
+    loaded_at = self._loaded_at.get(category)
+    if category not in self._ids or (loaded_at is not None and now - loaded_at >= self.max_age):
+      query = db.select([Question.id])
+      if category != self.ALL:
+        query = query.where(Question.category == category)
+      # plain rows: building ORM result tuples for a million ids costs seconds
+      ids = [question_id for question_id, in db.session.execute(query)]
+      self._ids[category] = ids
+      self._positions[category] = {question_id: position for position, question_id in enumerate(ids)}
+      self._loaded_at[category] = now
+    return self._ids[category], self._positions[category]
+
+  def pick(self, category, previous=()):
+    category = int(category)
+    previous = previous if isinstance(previous, (set, frozenset)) else set(previous)
+    with self._lock:
+      ids, positions = self._load(category)
+      if not ids:
+        return None
+      for _ in range(self.tries):
+        question_id = ids[self.rng.randrange(len(ids))]
+        if question_id not in previous:
+          return question_id
+      if sum(1 for question_id in previous if question_id in positions) >= len(ids):
+        return None
+      start = self.rng.randrange(len(ids))
+      for step in range(len(previous) + 1):
+        question_id = ids[(start + step) % len(ids)]
+        if question_id not in previous:
+          return question_id
+
+  def sample(self, category, count):
+    '''up to count distinct random ids of the category, in random order'''
+    with self._lock:
+      ids, _ = self._load(int(category))
+      return self.rng.sample(ids, min(count, len(ids)))
+
+  def _add(self, category, question_id):
+    if category in self._ids and question_id not in self._positions[category]:
+      self._positions[category][question_id] = len(self._ids[category])
+      self._ids[category].append(question_id)
+
+  def _remove(self, category, question_id):
+    if category not in self._ids:
+      return
+    ids, positions = self._ids[category], self._positions[category]
+    position = positions.pop(question_id, None)
+    if position is None:
+      return
+    last = ids.pop()
+    if last != question_id:
+      ids[position] = last
+      positions[last] = position
+
+  def added(self, question_id, category):
+    with self._lock:
+      self._add(self.ALL, question_id)
+      if category is not None:
+        self._add(int(category), question_id)
+
+  def removed(self, question_id, category):
+    with self._lock:
+      self._remove(self.ALL, question_id)
+      if category is not None:
+        self._remove(int(category), question_id)
+
+  def discard(self, question_id):
+    '''drops an id from every category, e.g. one deleted by another process'''
+    with self._lock:
+      for category in list(self._ids):
+        self._remove(category, question_id)
+
+  def moved(self, question_id, old_category, new_category):
+    with self._lock:
+      if old_category is not None:
+        self._remove(int(old_category), question_id)
+      if new_category is not None:
+        self._add(int(new_category), question_id)
+
+  def removed_many(self, questions):
+    '''questions: (id, category) pairs deleted together'''
+    with self._lock:
+      for question_id, category in questions:
+        self._remove(self.ALL, question_id)
+        if category is not None:
+          self._remove(int(category), question_id)
+
+  def moved_many(self, questions, new_category):
+    '''questions: (id, old category) pairs all moved to new_category'''
+    with self._lock:
+      for question_id, old_category in questions:
+        if old_category is not None:
+          self._remove(int(old_category), question_id)
+        if new_category is not None:
+          self._add(int(new_category), question_id)
+
+  def invalidate(self):
+    with self._lock:
+      self._ids.clear()
+      self._positions.clear()
+      self._loaded_at.clear()
+
+
+question_pool = QuestionPool()
 
 '''
 Question
@@ -26,11 +271,17 @@ Question
 '''
 class Question(db.Model):
   __tablename__ = 'questions'
+  __table_args__ = (
+    # serves category listings in id order, including pages by keyset
+    Index('ix_questions_category_id', 'category', 'id'),
+    # equality lookups of whole question texts, to skip duplicates on import
+    Index('ix_questions_question_hash', 'question', postgresql_using='hash'),
+  )
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
@@ -42,13 +293,25 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    category_cache.adjust(self.category, 1)
+    question_pool.added(self.id, self.category)
 
   def update(self):
+    history = inspect(self).attrs.category.history
     db.session.commit()
+    if history.has_changes():
+      for category in history.deleted:
+        category_cache.adjust(category, -1)
+      for category in history.added:
+        category_cache.adjust(category, 1)
+      question_pool.moved(self.id, (history.deleted or [None])[0], (history.added or [None])[0])
 
   def delete(self):
+    question_id, category = self.id, self.category
     db.session.delete(self)
     db.session.commit()
+    category_cache.adjust(category, -1)
+    question_pool.removed(question_id, category)
 
   def format(self):
     return {
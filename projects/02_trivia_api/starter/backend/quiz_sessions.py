@@ -0,0 +1,120 @@
+'''
+quiz_sessions.py
+    server-side quiz sessions holding a shuffled deck of question ids
+
+    EXAMPLE
+        store = make_store(app.config)
+        session_id = store.create([12, 5, 9])
+        store.pop(session_id)   # 12, then 5, 9, then None
+
+    A deck is drawn once when a quiz starts; every later request pops the
+    next id, so the client sends nothing but the session id and the server
+    does a single primary-key lookup. Sessions expire ttl seconds after
+    their last use.
+
+    Stores are chosen with the QUIZ_SESSION_STORE config value: 'memory'
+    (inside the process, the default) or 'redis' (any Redis-compatible server
+    at QUIZ_REDIS_URL, needs the redis package), which lets several server
+    processes share sessions.
+'''
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SessionNotFound(Exception):
+    '''raised for an unknown or expired session id'''
+    pass
+
+
+class MemorySessionStore(object):
+    '''
+    MemorySessionStore(ttl, max_sessions)
+        decks inside the process; past max_sessions the least recently
+        used session is dropped
+    '''
+    def __init__(self, ttl=3600, max_sessions=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, deck):
+        session_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[session_id] = (self.clock() + self.ttl, deque(deck))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def pop(self, session_id):
+        '''the next question id, None once the deck is empty'''
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] < self.clock():
+                self._sessions.pop(session_id, None)
+                raise SessionNotFound(session_id)
+            deck = entry[1]
+            self._sessions[session_id] = (self.clock() + self.ttl, deck)
+            self._sessions.move_to_end(session_id)
+            return deck.popleft() if deck else None
+
+    def delete(self, session_id):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise SessionNotFound(session_id)
+
+
+class RedisSessionStore(object):
+    '''
+    RedisSessionStore(url, ttl)
+        decks as Redis lists popped with LPOP; a marker key tells an
+        exhausted deck (whose list Redis removes) from an unknown session
+    '''
+    def __init__(self, url, ttl=3600, prefix='trivia:quiz:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("QUIZ_SESSION_STORE = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def create(self, deck):
+        session_id = secrets.token_urlsafe(16)
+        pipe = self.client.pipeline()
+        pipe.setex(self.prefix + session_id, self.ttl, 1)
+        if deck:
+            pipe.rpush(self.prefix + session_id + ':deck', *deck)
+            pipe.expire(self.prefix + session_id + ':deck', self.ttl)
+        pipe.execute()
+        return session_id
+
+    def pop(self, session_id):
+        key = self.prefix + session_id
+        pipe = self.client.pipeline()
+        pipe.expire(key, self.ttl)
+        pipe.lpop(key + ':deck')
+        pipe.expire(key + ':deck', self.ttl)
+        alive, question_id, _ = pipe.execute()
+        if not alive:
+            raise SessionNotFound(session_id)
+        return int(question_id) if question_id is not None else None
+
+    def delete(self, session_id):
+        key = self.prefix + session_id
+        if not self.client.delete(key, key + ':deck'):
+            raise SessionNotFound(session_id)
+
+
+def make_store(config):
+    '''the session store selected by QUIZ_SESSION_STORE'''
+    ttl = config.get('QUIZ_SESSION_TTL', 3600)
+    name = config.get('QUIZ_SESSION_STORE', 'memory')
+    if name == 'memory':
+        return MemorySessionStore(ttl, config.get('QUIZ_MAX_SESSIONS', 10000))
+    if name == 'redis':
+        return RedisSessionStore(config['QUIZ_REDIS_URL'], ttl)
+    raise RuntimeError('unknown QUIZ_SESSION_STORE %r' % name)
@@ -0,0 +1,215 @@
+'''
+search.py
+    substring search over question and answer text behind a pluggable backend
+
+    EXAMPLE
+        question_search.init_app(app)
+        questions, total = question_search.search('bird', offset=0, limit=10)
+
+    A question matches when the term occurs, case-insensitively, in its
+    question or its answer. Questions matching in the question text come
+    first, then those with less text around the term, then lower ids; both
+    backends rank the same way.
+
+    The 'postgresql' backend filters through a pg_trgm GIN index over the
+    question and answer text, so a term of three or more characters no
+    longer reads the whole table. The 'memory' backend keeps a trigram index
+    inside the process, for databases without pg_trgm (e.g. SQLite in
+    tests). SEARCH_BACKEND picks one; by default it follows the database.
+'''
+import logging
+
+from sqlalchemy import case, event, func
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Question
+
+log = logging.getLogger(__name__)
+
+TRIGRAM_INDEX_DDL = (
+    "CREATE INDEX IF NOT EXISTS ix_questions_text_trgm ON questions "
+    "USING gin ((coalesce(question, '') || ' ' || coalesce(answer, '')) gin_trgm_ops)")
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def ngrams(text, n=3):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NGramIndex(object):
+    '''
+    NGramIndex(n)
+        maps every n-gram of the lower-cased question and answer text to the
+        questions containing it; a search intersects the postings of the
+        term's n-grams and confirms the candidates by substring
+    '''
+    def __init__(self, n=3):
+        self.n = n
+        self._postings = {}
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, doc_id, question, answer):
+        self.remove(doc_id)
+        question, answer = (question or '').lower(), (answer or '').lower()
+        self._documents[doc_id] = (question, question + ' ' + answer)
+        for gram in ngrams(question + ' ' + answer, self.n):
+            self._postings.setdefault(gram, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        for gram in ngrams(document[1], self.n):
+            postings = self._postings[gram]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, term):
+        '''ids of the questions containing term, best matches first'''
+        term = term.lower()
+        grams = ngrams(term, self.n)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = self._documents
+        ranked = []
+        for doc_id in candidates:
+            question, text = self._documents[doc_id]
+            if term in text:
+                ranked.append((term not in question, len(text), doc_id))
+        ranked.sort()
+        return [doc_id for _, _, doc_id in ranked]
+
+
+# what the trigram index is built on
+question_text = func.coalesce(Question.question, '') + ' ' + func.coalesce(Question.answer, '')
+
+
+def contains(term):
+    '''the criterion for questions whose question or answer contains term, ignoring case'''
+    return question_text.ilike('%' + escape_like(term) + '%', escape='\\')
+
+
+def fetch_in_order(ids):
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(ids))} if ids else {}
+    return [questions[question_id] for question_id in ids if question_id in questions]
+
+
+class PostgresSearchBackend(object):
+    '''
+    PostgresSearchBackend
+        filters with ILIKE over the same expression the trigram index is built on
+    '''
+    def setup(self):
+        '''creates pg_trgm and the index if needed; False if pg_trgm is not available'''
+        try:
+            db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            db.session.execute(TRIGRAM_INDEX_DDL)
+            db.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            log.warning('pg_trgm unavailable, searching in memory: %s', e)
+            return False
+
+    def search(self, term, offset, limit):
+        pattern = '%' + escape_like(term) + '%'
+        query = Question.query.filter(contains(term))
+        total = query.count()
+        questions = query.order_by(
+            case([(Question.question.ilike(pattern, escape='\\'), 0)], else_=1),
+            func.length(question_text),
+            Question.id
+        ).offset(offset).limit(limit).all()
+        return questions, total
+
+    def add(self, question_id, question, answer):
+        pass
+
+    def remove(self, question_id):
+        pass
+
+
+class InMemorySearchBackend(object):
+    '''
+    InMemorySearchBackend
+        builds an NGramIndex from the database on first use and keeps it
+        current from Question's mapper events
+    '''
+    def __init__(self):
+        self._index = None
+
+    def setup(self):
+        return True
+
+    def index(self):
+        if self._index is None:
+            index = NGramIndex()
+            for doc_id, question, answer in db.session.query(Question.id, Question.question, Question.answer):
+                index.add(doc_id, question, answer)
+            self._index = index
+        return self._index
+
+    def search(self, term, offset, limit):
+        ids = self.index().search(term)
+        return fetch_in_order(ids[offset:offset + limit]), len(ids)
+
+    def add(self, question_id, question, answer):
+        if self._index is not None:
+            self._index.add(question_id, question, answer)
+
+    def remove(self, question_id):
+        if self._index is not None:
+            self._index.remove(question_id)
+
+
+class QuestionSearch(object):
+    '''
+    QuestionSearch()
+        entry point used by the views; init_app() picks the backend from
+        SEARCH_BACKEND, or from the database dialect when it is not set
+    '''
+    def __init__(self):
+        self.backend = None
+        event.listen(Question, 'after_insert', lambda mapper, connection, target: self._add(target))
+        event.listen(Question, 'after_update', lambda mapper, connection, target: self._add(target))
+        event.listen(Question, 'after_delete', lambda mapper, connection, target: self._remove(target))
+
+    def init_app(self, app):
+        with app.app_context():
+            name = app.config.get('SEARCH_BACKEND') or (
+                'postgresql' if db.engine.dialect.name == 'postgresql' else 'memory')
+            backend = PostgresSearchBackend() if name == 'postgresql' else InMemorySearchBackend()
+            if not backend.setup():
+                backend = InMemorySearchBackend()
+        self.backend = backend
+
+    def search(self, term, offset=0, limit=10):
+        '''(questions of the requested slice, number of matches)'''
+        return self.backend.search(term, offset, limit)
+
+    def added(self, question_id, question, answer):
+        '''for questions written without the ORM, which raises no mapper events'''
+        if self.backend is not None:
+            self.backend.add(question_id, question, answer)
+
+    def removed(self, question_id):
+        if self.backend is not None:
+            self.backend.remove(question_id)
+
+    def _add(self, target):
+        self.added(target.id, target.question, target.answer)
+
+    def _remove(self, target):
+        self.removed(target.id)
+
+
+question_search = QuestionSearch()
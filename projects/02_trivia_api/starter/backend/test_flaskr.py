@@ -2,9 +2,29 @@ import os
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, QuestionPool, category_cache, question_pool
+from quiz_sessions import MemorySessionStore, SessionNotFound
+from search import NGramIndex, InMemorySearchBackend, question_search
+
+
+class QueryCounter(object):
+    '''counts the statements sent to the database while the block is active'''
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_cursor_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -44,6 +64,25 @@ class TriviaTestCase(unittest.TestCase):
 
 
 
+    def test_pages_cut_in_sql(self):
+        first = json.loads(self.client().get('/questions').data)
+        second = json.loads(self.client().get('/questions?page=2').data)
+        ids = [question['id'] for question in first['questions'] + second['questions']]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(first['questions']), 10)
+        self.assertEqual(first['total_questions'], Question.query.count())
+        with QueryCounter(db.engine) as queries:
+            res = self.client().get('/questions?after=%d' % first['next_after'])
+        self.assertEqual(json.loads(res.data)['questions'], second['questions'])
+        self.assertEqual(queries.count, 1)
+
+    def test_page_size(self):
+        client = create_app({'QUESTIONS_PER_PAGE': 4}).test_client
+        data = json.loads(client().get('/questions').data)
+        self.assertEqual(len(data['questions']), 4)
+        data = json.loads(client().get('/questions?per_page=1000').data)
+        self.assertEqual(len(data['questions']), min(100, data['total_questions']))
+
     def test_404_get_paginated_questions_failure(self):
         res = self.client().get('/questions?page=1000')
         data = json.loads(res.data)
@@ -129,6 +168,106 @@ class TriviaTestCase(unittest.TestCase):
 
 
 
+    def test_bulk_create_questions(self):
+        lines = [
+            {'question': 'Bulk zzqy one?', 'answer': 'One', 'category': 1, 'difficulty': 1},
+            {'question': "  Whose autobiography is entitled 'I Know Why the Caged Bird Sings'? ",
+             'answer': 'Maya Angelou', 'category': 4, 'difficulty': 2},
+            {'question': 'Bulk zzqy two?', 'answer': 'Two', 'category': 1000, 'difficulty': 1},
+            {'question': 'Bulk zzqy three?', 'answer': 'Three', 'category': '2', 'difficulty': 6},
+            {'question': 'Bulk zzqy one?', 'answer': 'Again', 'category': 1, 'difficulty': 1},
+            {'question': 'Bulk zzqy four?', 'answer': 'Four', 'category': '2', 'difficulty': '5'},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n{not json\n\n'
+        before = category_cache.total_questions()
+        res = self.client().post('/questions/bulk?batch_size=3', data=body,
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+        try:
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(data['success'], False)
+            self.assertEqual((data['inserted'], data['duplicates'], data['rejected'], data['failed']), (2, 2, 3, 0))
+            self.assertEqual([(batch['first_line'], batch['last_line'], batch['committed'])
+                              for batch in data['batches']], [(1, 3, True), (4, 6, True), (7, 7, True)])
+            self.assertEqual(data['batches'][0]['errors'], [{'line': 3, 'error': 'unknown category 1000'}])
+            self.assertEqual(data['batches'][1]['errors'], [{'line': 4, 'error': 'difficulty must be from 1 to 5'}])
+            self.assertEqual(data['batches'][2]['errors'], [{'line': 7, 'error': 'not valid JSON'}])
+            self.assertEqual(category_cache.total_questions(), before + 2)
+            found = json.loads(self.client().post('/questions/search', json={'searchTerm': 'bulk zzqy'}).data)
+            self.assertEqual([question['category'] for question in found['questions']], [1, 2])
+        finally:
+            with self.app.app_context():
+                for question in Question.query.filter(Question.question.like('Bulk zzqy%')):
+                    question.delete()
+
+        self.assertEqual(self.client().post('/questions/bulk', data='').status_code, 400)
+        self.assertEqual(self.client().post('/questions/bulk?batch_size=0', data='{}').status_code, 422)
+
+    def test_import_questions_command(self):
+        pack = json.dumps({'question': 'Imported zzqy?', 'answer': 'Yes', 'category': 3, 'difficulty': 3})
+        result = self.app.test_cli_runner().invoke(args=['import-questions', '-'], input=pack + '\n' + pack)
+        try:
+            self.assertEqual(result.exit_code, 0)
+            self.assertIn('1 inserted, 1 duplicates, 0 rejected, 0 failed', result.output)
+        finally:
+            with self.app.app_context():
+                Question.query.filter(Question.question == 'Imported zzqy?').one().delete()
+
+    def add_questions(self, *questions):
+        with self.app.app_context():
+            created = [Question(question=text, answer='zzqw', difficulty=difficulty, category=category)
+                       for text, category, difficulty in questions]
+            for question in created:
+                question.insert()
+            return [question.id for question in created]
+
+    def test_batch_delete_questions(self):
+        with self.app.app_context():
+            question_pool.sample(0, 1)
+        ids = self.add_questions(('Batch zzqw one?', 1, 1), ('Batch zzqw two?', 2, 1),
+                                 ('Batch zzqw three?', 2, 5))
+        before = category_cache.question_counts()
+        with QueryCounter(db.engine) as queries:
+            res = self.client().delete('/questions', json={'ids': ids[:2]})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], 2)
+        self.assertEqual(queries.count, 1)
+        counts = category_cache.question_counts()
+        self.assertEqual((counts[1], counts[2]), (before[1] - 1, before[2] - 1))
+        self.assertEqual(data['total_questions'], sum(counts.values()))
+
+        res = self.client().delete('/questions', json={'filter': {'search': 'batch ZZQW', 'difficulty': [4, 5]}})
+        self.assertEqual(json.loads(res.data)['deleted'], 1)
+        with self.app.app_context():
+            self.assertEqual(Question.query.filter(Question.id.in_(ids)).count(), 0)
+            self.assertFalse(set(question_pool.sample(0, 10 ** 6)) & set(ids))
+
+    def test_batch_update_questions(self):
+        ids = self.add_questions(('Batch zzqw one?', 1, 1), ('Batch zzqw two?', 2, 1))
+        try:
+            before = category_cache.question_counts()
+            res = self.client().patch('/questions', json={'filter': {'search': 'batch zzqw'},
+                                                          'set': {'category': 3, 'difficulty': 4}})
+            self.assertEqual(json.loads(res.data)['updated'], 2)
+            counts = category_cache.question_counts()
+            self.assertEqual((counts[1], counts[2], counts[3]), (before[1] - 1, before[2] - 1, before[3] + 2))
+            with self.app.app_context():
+                self.assertEqual({(question.category, question.difficulty) for question in
+                                  Question.query.filter(Question.id.in_(ids))}, {(3, 4)})
+                category_cache.invalidate()
+                self.assertEqual(category_cache.question_counts(), counts)
+        finally:
+            self.client().delete('/questions', json={'ids': ids})
+
+    def test_422_batch_questions_failure(self):
+        for body in ({}, {'filter': {}}, {'ids': [1], 'filter': {'category': 1}}, {'filter': {'answer': 'x'}},
+                     {'ids': ['one']}, {'filter': {'category': True}}):
+            self.assertEqual(self.client().delete('/questions', json=body).status_code, 422)
+        for values in ({}, {'category': 1000}, {'difficulty': 9}, {'question': 'x'}):
+            res = self.client().patch('/questions', json={'ids': [1], 'set': values})
+            self.assertEqual(res.status_code, 422)
+
     def test_get_questions_by_category(self):
         res = self.client().get('/categories/1/questions')
         data = json.loads(res.data)
@@ -138,6 +277,21 @@ class TriviaTestCase(unittest.TestCase):
 
 
 
+    def test_category_questions_paginated(self):
+        with self.app.app_context():
+            in_category = [question.id for question in Question.query.filter(Question.category == 1)]
+        first = json.loads(self.client().get('/categories/1/questions?per_page=2').data)
+        self.assertEqual([question['id'] for question in first['questions']], sorted(in_category)[:2])
+        self.assertEqual(first['total_questions'], len(in_category))
+        self.assertTrue(all(question['category'] == 1 for question in first['questions']))
+        with QueryCounter(db.engine) as queries:
+            res = self.client().get('/categories/1/questions?per_page=2&after=%d' % first['next_after'])
+        self.assertEqual([question['id'] for question in json.loads(res.data)['questions']],
+                         sorted(in_category)[2:4])
+        self.assertEqual(queries.count, 1)
+        second = json.loads(self.client().get('/categories/1/questions?per_page=2&page=2').data)
+        self.assertEqual(second['questions'], json.loads(res.data)['questions'])
+
     def test_400_get_questions_by_category_failure(self):
         res = self.client().get('/categories/1000/questions')
         data = json.loads(res.data)
@@ -158,6 +312,61 @@ class TriviaTestCase(unittest.TestCase):
 
 
 
+    def test_search_ranks_question_matches_before_answers(self):
+        with self.app.app_context():
+            in_answer = Question(question='Which bird is the largest?', answer='Ostrich zzqx',
+                                 difficulty=1, category=1)
+            in_question = Question(question='What does zzqx mean?', answer='Nothing',
+                                   difficulty=1, category=1)
+            in_answer.insert()
+            in_question.insert()
+            ids = [in_question.id, in_answer.id]
+        try:
+            data = json.loads(self.client().post('/questions/search', json={'searchTerm': 'ZZQX'}).data)
+            self.assertEqual([question['id'] for question in data['questions']], ids)
+            self.assertEqual(data['total_questions'], 2)
+
+            res = self.client().post('/questions/search?page=2&per_page=1', json={'searchTerm': 'zzqx'})
+            data = json.loads(res.data)
+            self.assertEqual([question['id'] for question in data['questions']], ids[1:])
+            self.assertEqual(data['total_questions'], 2)
+            res = self.client().post('/questions/search?page=3&per_page=1', json={'searchTerm': 'zzqx'})
+            self.assertEqual(res.status_code, 422)
+        finally:
+            with self.app.app_context():
+                for question_id in ids:
+                    Question.query.get(question_id).delete()
+
+    def test_search_in_memory(self):
+        index = NGramIndex()
+        index.add(1, 'Who wrote Hamlet?', 'Shakespeare')
+        index.add(2, 'Who painted the Mona Lisa?', 'Leonardo da Vinci')
+        index.add(3, 'Who wrote 100% of Hamlet?', 'Shakespeare')
+        self.assertEqual(index.search('HAMLET'), [1, 3])
+        self.assertEqual(index.search('spear'), [1, 3])
+        self.assertEqual(index.search('da'), [2])
+        self.assertEqual(index.search('100%'), [3])
+        self.assertEqual(index.search('hamlets'), [])
+        index.remove(1)
+        self.assertEqual(index.search('hamlet'), [3])
+
+        app = create_app({'SEARCH_BACKEND': 'memory'})
+        try:
+            self.assertIsInstance(question_search.backend, InMemorySearchBackend)
+            data = json.loads(app.test_client().post('/questions/search', json={'searchTerm': 'bird'}).data)
+            self.assertEqual([question['id'] for question in data['questions']], [5])
+            with app.app_context():
+                question = Question(question='Where do kiwi birds live?', answer='New Zealand',
+                                    difficulty=1, category=3)
+                question.insert()
+                data = json.loads(app.test_client().post('/questions/search', json={'searchTerm': 'bird'}).data)
+                self.assertEqual([q['id'] for q in data['questions']], [question.id, 5])
+                question.delete()
+            data = json.loads(app.test_client().post('/questions/search', json={'searchTerm': 'bird'}).data)
+            self.assertEqual(data['total_questions'], 1)
+        finally:
+            create_app()
+
     def test_404_search_questions_failure(self):
         response = self.client().post('/questions',
                                       json={'searchTerm': 'rohanjoshi'})
@@ -181,6 +390,149 @@ class TriviaTestCase(unittest.TestCase):
 
 
 
+    def test_categories_served_from_cache(self):
+        category_cache.invalidate()
+        self.client().get('/categories')
+        with QueryCounter(db.engine) as queries:
+            res = self.client().get('/categories')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(queries.count, 0)
+        self.assertEqual(json.loads(res.data)['categories']['1'], 'Science')
+
+    def test_question_counts_follow_insert_and_delete(self):
+        category_cache.invalidate()
+        before = category_cache.total_questions(2)
+        loads = category_cache.loads
+        question = Question(question='question', answer='answer', difficulty=1, category=2)
+        question.insert()
+        self.assertEqual(category_cache.total_questions(2), before + 1)
+        question.category = 3
+        question.update()
+        self.assertEqual(category_cache.total_questions(2), before)
+        question.delete()
+        self.assertEqual(category_cache.question_counts(), self.counts_in_database())
+        self.assertEqual(category_cache.loads, loads)
+
+    def counts_in_database(self):
+        counts = {}
+        for question in Question.query.all():
+            counts[int(question.category)] = counts.get(int(question.category), 0) + 1
+        return counts
+
+    def test_play_quiz_until_category_exhausted(self):
+        asked = []
+        while True:
+            res = self.client().post('/quizzes', json={'previous_questions': asked,
+                                                       'quiz_category': {'type': 'Art', 'id': 2}})
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 200)
+            if 'question' not in data:
+                break
+            self.assertNotIn(data['question']['id'], asked)
+            self.assertEqual(int(data['question']['category']), 2)
+            asked.append(data['question']['id'])
+        self.assertEqual(len(asked), Question.query.filter(Question.category == 2).count())
+
+    def test_quiz_pick_bounded(self):
+        class Stub(object):
+            # always draws the first position, the worst case for rejection sampling
+            def randrange(self, stop):
+                return 0
+
+        pool = QuestionPool(tries=3, rng=Stub())
+        pool._ids[7] = list(range(100000))
+        pool._positions[7] = {question_id: question_id for question_id in range(100000)}
+        previous = set(range(5))
+        self.assertEqual(pool.pick(7, previous), 5)
+        pool.removed(5, 7)
+        self.assertEqual(pool.pick(7, previous), 99999)
+        self.assertIsNone(pool.pick(7, set(range(100000))))
+
+    def test_play_quiz_skips_questions_deleted_elsewhere(self):
+        with self.app.app_context():
+            question = Question(question='Stale zzqv?', answer='Gone', difficulty=1, category=6)
+            question.insert()
+            stale_id = question.id
+            others = [q.id for q in Question.query.filter(Question.category == 6, Question.id != stale_id)]
+            question_pool.pick(6)
+            # deleted by another process: this process's pool still holds the id
+            db.session.execute(Question.__table__.delete().where(Question.id == stale_id))
+            db.session.commit()
+        category_cache.invalidate()
+        res = self.client().post('/quizzes', json={'previous_questions': others,
+                                                   'quiz_category': {'type': 'Sports', 'id': 6}})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('question', data)
+        self.assertNotIn(stale_id, question_pool._positions[6])
+
+    def test_quiz_pool_expires(self):
+        clock = [0]
+        with self.app.app_context():
+            pool = QuestionPool(max_age=60, clock=lambda: clock[0])
+            pool.pick(1)
+            loaded = list(pool._ids[1])
+            pool._remove(1, loaded[0])
+            clock[0] = 59
+            pool.pick(1)
+            self.assertNotIn(loaded[0], pool._ids[1])
+            clock[0] = 60
+            pool.pick(1)
+            self.assertEqual(sorted(pool._ids[1]), sorted(loaded))
+
+    def test_quiz_pool_follows_insert_and_delete(self):
+        question_pool.pick(6)
+        question_pool.pick(0)
+        question = Question(question='question', answer='answer', difficulty=1, category=6)
+        question.insert()
+        self.assertIn(question.id, question_pool._positions[6])
+        self.assertIn(question.id, question_pool._positions[0])
+        question.delete()
+        self.assertNotIn(question.id, question_pool._positions[6])
+        self.assertNotIn(question.id, question_pool._positions[0])
+
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Science', 'id': 1},
+                                                             'length': 3})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        session_id = data['session_id']
+        asked = [data['question']['id']]
+        for _ in range(2):
+            with QueryCounter(db.engine) as queries:
+                data = json.loads(self.client().post(f'/quizzes/sessions/{session_id}/next').data)
+            self.assertEqual(queries.count, 1)
+            self.assertEqual(int(data['question']['category']), 1)
+            asked.append(data['question']['id'])
+        self.assertEqual(len(set(asked)), 3)
+        data = json.loads(self.client().post(f'/quizzes/sessions/{session_id}/next').data)
+        self.assertEqual(data, {'success': True})
+        self.assertEqual(self.client().delete(f'/quizzes/sessions/{session_id}').status_code, 200)
+        self.assertEqual(self.client().post(f'/quizzes/sessions/{session_id}/next').status_code, 404)
+
+    def test_quiz_session_failures(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': 1000}})
+        self.assertEqual(res.status_code, 404)
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': 1}, 'length': 0})
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(self.client().post('/quizzes/sessions/unknown/next').status_code, 404)
+
+    def test_quiz_sessions_expire(self):
+        clock = [0]
+        store = MemorySessionStore(ttl=60, max_sessions=2, clock=lambda: clock[0])
+        first = store.create([1, 2])
+        clock[0] = 50
+        self.assertEqual(store.pop(first), 1)
+        clock[0] = 100
+        self.assertEqual(store.pop(first), 2)
+        self.assertIsNone(store.pop(first))
+        clock[0] = 161
+        with self.assertRaises(SessionNotFound):
+            store.pop(first)
+        sessions = [store.create([n]) for n in range(3)]
+        with self.assertRaises(SessionNotFound):
+            store.pop(sessions[0])
+
     def test_422_play_quiz_fails(self):
         res = self.client().post('quizzes', json={})
         data = json.loads(res.data)
@@ -4,8 +4,11 @@ from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from sqlalchemy.orm import load_only
+
+from .database.models import db_drop_and_create_all, db_upgrade, setup_db, Drink
+from .auth.auth import AuthError, requires_auth, verifier
+from .menu_cache import MenuCache
 
 app = Flask(__name__)
 setup_db(app)
@@ -17,6 +20,9 @@ CORS(app)
 !! NOTE THIS MUST BE UNCOMMENTED ON FIRST RUN
 '''
 # db_drop_and_create_all()
+db_upgrade()
+# serialized /drinks and /drinks-detail bodies, rebuilt when the menu version changes
+menu_cache = MenuCache()
 
 # ROUTES
 '''
@@ -33,15 +39,19 @@ CORS(app)
 @app.route('/drinks')
 def get_drinks():
 
-    try:
-        drinks = Drink.query.all()
+    def build():
+        # the full recipe is neither loaded nor decoded for the menu
+        drinks = Drink.query.options(load_only('id', 'title', 'recipe_short')).all()
 
         drinks_short = [drink.short() for drink in drinks]
 
-        return jsonify({
+        return {
             "success": True,
             "drinks": drinks_short
-        })
+        }
+
+    try:
+        return menu_cache.response('drinks', build)
     except:
         abort(404)
 
@@ -60,15 +70,18 @@ def get_drinks():
 @app.route('/drinks-detail')
 @requires_auth('get:drinks-detail')
 def get_drinks_detail(jwt):
-    try:
+    def build():
         drinks = Drink.query.all()
 
         drinks_long = [drink.long() for drink in drinks]
 
-        return jsonify({
+        return {
             "success": True,
             "drinks": drinks_long
-        })
+        }
+
+    try:
+        return menu_cache.response('drinks-detail', build, private=True)
     except:
         abort(404)
 
@@ -98,7 +111,7 @@ def add_drink(jwt):
 
     try:
         print (recipe, title)
-        drink = Drink(title=title, recipe=json.dumps(recipe))
+        drink = Drink(title=title, recipe=recipe)
         drink.insert()
 
         return jsonify({
@@ -188,6 +201,30 @@ def delete_drink(jwt, drink_id):
         abort(404)
 
 
+'''
+GET /auth/stats
+    public endpoint reporting the verified-token cache hit rate, the
+    verification time it saved and how often the JWKS was fetched
+'''
+
+
+@app.route('/auth/stats')
+def auth_stats():
+    return jsonify(dict(verifier.stats(), success=True))
+
+
+'''
+GET /menu/stats
+    public endpoint reporting how often this process rebuilt the menu
+    responses, served them from its cache or answered 304 Not Modified
+'''
+
+
+@app.route('/menu/stats')
+def menu_stats():
+    return jsonify(dict(menu_cache.stats(), success=True))
+
+
 # Error Handling
 '''
 Example error handling for unprocessable entity
@@ -238,4 +275,4 @@ def handle_auth_error(ex):
                     "success": False,
                     "error": ex.status_code,
                     'message': ex.error
-                }), 401
+                }), ex.status_code
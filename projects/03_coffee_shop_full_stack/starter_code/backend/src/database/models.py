@@ -1,5 +1,7 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, JSON, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -28,6 +30,68 @@ db_drop_and_create_all()
 def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
+    create_menu_version()
+
+'''
+db_upgrade()
+    brings a database created by an earlier version of this file up to date:
+    adds the recipe_short column to the drink table and fills it from each
+    drink's recipe, and creates the menu_version table and its row; does
+    nothing on an up to date database
+'''
+def db_upgrade():
+    inspector = inspect(db.engine)
+    if 'drink' not in inspector.get_table_names():
+        return
+    if 'recipe_short' not in [column['name'] for column in inspector.get_columns('drink')]:
+        db.session.execute("ALTER TABLE drink ADD COLUMN recipe_short JSON NOT NULL DEFAULT '[]'")
+        for drink in Drink.query.all():
+            drink.recipe = drink.recipe
+        db.session.commit()
+    MenuVersion.__table__.create(db.engine, checkfirst=True)
+    create_menu_version()
+
+'''
+create_menu_version()
+    adds the single menu_version row if it is missing, once, when the schema
+    is set up, so bumping the version never has to insert it
+'''
+def create_menu_version():
+    try:
+        if db.session.query(MenuVersion.id).filter(MenuVersion.id == 1).scalar() is None:
+            db.session.add(MenuVersion(id=1, version=0))
+        db.session.commit()
+    except IntegrityError:
+        # another process starting at the same time added it first
+        db.session.rollback()
+
+'''
+menu_version()
+    the current version of the menu, 0 before the first change
+'''
+def menu_version():
+    return db.session.query(MenuVersion.version).filter(MenuVersion.id == 1).scalar() or 0
+
+'''
+bump_menu_version()
+    increments the menu version in the current transaction, so the new
+    version is committed together with the change to the drinks; the row
+    itself comes from db_upgrade() or db_drop_and_create_all()
+'''
+def bump_menu_version():
+    db.session.query(MenuVersion).filter(MenuVersion.id == 1).update(
+        {MenuVersion.version: MenuVersion.version + 1}, synchronize_session=False)
+
+'''
+MenuVersion
+a single row counting changes to the drinks; every process serving the
+menu reads it to tell whether its cached responses are still current
+'''
+class MenuVersion(db.Model):
+    __tablename__ = 'menu_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
 
 '''
 Drink
@@ -38,21 +102,37 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients, stored as JSON and decoded once when the row is loaded
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+    # the recipe without ingredient names, as short() returns it; kept in step
+    # with recipe on every write so listing drinks never loads the full recipe
+    recipe_short = Column(JSON, nullable=False)
+
+    '''
+    recipe validator
+        accepts a list of ingredients, a single ingredient or their JSON text,
+        stores a list and precomputes recipe_short from it;
+        raises KeyError or TypeError for a malformed ingredient
+    '''
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        if isinstance(recipe, str):
+            recipe = json.loads(recipe)
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        self.recipe_short = [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+        return recipe
 
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.recipe_short
         }
 
     '''
@@ -63,7 +143,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     '''
@@ -77,6 +157,7 @@ class Drink(db.Model):
     '''
     def insert(self):
         db.session.add(self)
+        bump_menu_version()
         db.session.commit()
 
     '''
@@ -89,6 +170,7 @@ class Drink(db.Model):
     '''
     def delete(self):
         db.session.delete(self)
+        bump_menu_version()
         db.session.commit()
 
     '''
@@ -101,6 +183,7 @@ class Drink(db.Model):
             drink.update()
     '''
     def update(self):
+        bump_menu_version()
         db.session.commit()
 
     def __repr__(self):
@@ -0,0 +1,98 @@
+'''
+menu_cache.py
+    serialized menu responses with strong ETags and conditional GET
+
+    EXAMPLE
+        menu_cache = MenuCache()
+
+        @app.route('/drinks')
+        def get_drinks():
+            return menu_cache.response('drinks', lambda: {'success': True, 'drinks': ...})
+
+    Each representation of the menu ('drinks', 'drinks-detail') is serialized
+    once per menu version and process; until add_drink, update_drink or
+    delete_drink bumps the version, a request costs one lookup of the version
+    row and the cached bytes are sent as they are. The ETag names the
+    representation, the version and a digest of the body, so it stays unique
+    even if the database is recreated and the counter starts over. A request
+    whose If-None-Match lists the current ETag gets a 304 without a body.
+'''
+import hashlib
+import threading
+from collections import namedtuple
+
+from flask import Response, jsonify, request
+
+from .database.models import menu_version
+
+'''
+MenuEntry
+    version: the menu version the body was built from
+    body: the serialized JSON response
+    etag: its entity tag, without quotes
+'''
+MenuEntry = namedtuple('MenuEntry', ['version', 'body', 'etag'])
+
+
+class MenuCache(object):
+    '''
+    MenuCache()
+        the latest serialized body of each menu representation;
+        stats() counts responses built, served from the cache and not modified
+    '''
+    def __init__(self):
+        self.builds = 0
+        self.hits = 0
+        self.not_modified = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entry(self, representation, build):
+        '''the MenuEntry of the current version, calling build() for its payload if needed'''
+        # read before the drinks: a body built from newer drinks than its
+        # version is only rebuilt once more, never served as current when stale
+        version = menu_version()
+        entry = self._entries.get(representation)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+
+        body = jsonify(build()).get_data()
+        entry = MenuEntry(version, body, '%s-%d-%s' % (
+            representation, version, hashlib.sha256(body).hexdigest()[:16]))
+        with self._lock:
+            self.builds += 1
+            current = self._entries.get(representation)
+            if current is None or current.version <= version:
+                self._entries[representation] = entry
+        return entry
+
+    def response(self, representation, build, private=False):
+        '''
+        response(representation, build)
+            build: returns the payload when the cached body is out of date
+            private: the representation needs authorization and must not be
+                kept by shared caches
+        '''
+        entry = self.entry(representation, build)
+        if request.if_none_match.contains(entry.etag):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        # clients keep the body but revalidate it on every poll
+        response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'builds': self.builds,
+            'hits': self.hits,
+            'not_modified': self.not_modified,
+            'versions': {representation: entry.version for representation, entry in self._entries.items()},
+        }
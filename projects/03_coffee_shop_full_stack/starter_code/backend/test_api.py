@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from fsnd_auth.testing import StubJWKSServer, TestIssuer
+
+from src.api import app, menu_cache
+from src.auth.auth import verifier
+from src.database.models import (db, db_drop_and_create_all, db_upgrade, create_menu_version,
+                                 menu_version, Drink, MenuVersion)
+
+ISSUER = TestIssuer('RS256', domain='coffee.test', audience='shop')
+
+
+class CoffeeShopTestCase(unittest.TestCase):
+    """Base test case running the app against a fresh database in a temporary directory"""
+
+    def setUp(self):
+        self.original = (verifier.settings, app.config['SQLALCHEMY_DATABASE_URI'])
+        ISSUER.configure(verifier)
+        # keep the project's database.db untouched
+        self.directory = tempfile.mkdtemp()
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.directory, 'test.db')
+        self.client = app.test_client
+        # every test starts over at menu version 0
+        menu_cache.clear()
+        with app.app_context():
+            db.session.remove()
+            db_drop_and_create_all()
+            db.session.add(Drink(title='Water', recipe=[{'name': 'water', 'color': 'blue', 'parts': 1}]))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.get_engine(app).dispose()
+        verifier.settings, app.config['SQLALCHEMY_DATABASE_URI'] = self.original
+        shutil.rmtree(self.directory)
+
+    def headers(self, *permissions):
+        return {'Authorization': 'Bearer ' + ISSUER.token(permissions=permissions)}
+
+    def water_id(self):
+        with app.app_context():
+            return Drink.query.filter_by(title='Water').one().id
+
+
+class RecipeTestCase(CoffeeShopTestCase):
+    """This class represents the drink recipe storage test case"""
+
+    def test_recipe_accepts_list_object_and_json_text(self):
+        ingredient = {'name': 'milk', 'color': 'white', 'parts': 2}
+        with app.app_context():
+            for recipe in ([ingredient], ingredient, json.dumps([ingredient]), json.dumps(ingredient)):
+                drink = Drink(title='Milk', recipe=recipe)
+                self.assertEqual(drink.recipe, [ingredient])
+                self.assertEqual(drink.recipe_short, [{'color': 'white', 'parts': 2}])
+
+    def test_422_patch_malformed_ingredient(self):
+        res = self.client().patch('/drinks/%d' % self.water_id(), json={'recipe': [{'name': 'water'}]},
+                                  headers=self.headers('patch:drinks'))
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(res.get_json()['success'], False)
+        with app.app_context():
+            self.assertEqual(Drink.query.get(self.water_id()).recipe_short, [{'color': 'blue', 'parts': 1}])
+
+    def test_patch_keeps_recipe_short_in_step(self):
+        recipe = [{'name': 'espresso', 'color': 'brown', 'parts': 1}, {'name': 'milk', 'color': 'white', 'parts': 3}]
+        res = self.client().patch('/drinks/%d' % self.water_id(), json={'recipe': recipe},
+                                  headers=self.headers('patch:drinks'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'][0]['recipe'], recipe)
+        with app.app_context():
+            drink = Drink.query.get(self.water_id())
+            self.assertEqual(drink.recipe_short, [{'color': 'brown', 'parts': 1}, {'color': 'white', 'parts': 3}])
+
+    def test_get_drinks_short_form_without_recipe(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.get_engine(app)
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            res = self.client().get('/drinks')
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks'], [
+            {'id': self.water_id(), 'title': 'Water', 'recipe': [{'color': 'blue', 'parts': 1}]}])
+        selects = [statement for statement in statements if 'FROM drink' in statement]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('drink.recipe_short', selects[0])
+        self.assertIsNone(re.search(r'drink\.recipe\b(?!_)', selects[0]))
+
+    def test_upgrade_fills_recipe_short(self):
+        recipe = [{'name': 'water', 'color': 'blue', 'parts': 1}, {'name': 'ice', 'color': 'white', 'parts': 2}]
+        with app.app_context():
+            # a database from before recipe_short and menu_version
+            db.drop_all()
+            db.session.execute('CREATE TABLE drink (id INTEGER PRIMARY KEY, title VARCHAR(80) UNIQUE, '
+                               'recipe VARCHAR(180) NOT NULL)')
+            db.session.execute('INSERT INTO drink (title, recipe) VALUES (:title, :recipe)',
+                               {'title': 'Iced Water', 'recipe': json.dumps(recipe)})
+            db.session.commit()
+
+            db_upgrade()
+            db.session.remove()
+
+            drink = Drink.query.filter_by(title='Iced Water').one()
+            self.assertEqual(drink.recipe, recipe)
+            self.assertEqual(drink.recipe_short, [{'color': 'blue', 'parts': 1}, {'color': 'white', 'parts': 2}])
+            self.assertEqual(menu_version(), 0)
+            self.assertEqual(MenuVersion.query.count(), 1)
+
+
+class MenuVersionTestCase(CoffeeShopTestCase):
+    """This class represents the menu version test case"""
+
+    def test_row_created_with_the_schema(self):
+        with app.app_context():
+            self.assertEqual(menu_version(), 0)
+            # running it again, as a second process starting up would, adds nothing
+            create_menu_version()
+            self.assertEqual(MenuVersion.query.count(), 1)
+
+    def test_write_bumps_the_version(self):
+        res = self.client().post('/drinks', json={
+            'title': 'Milk', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 1}]},
+            headers=self.headers('post:drinks'))
+
+        self.assertEqual(res.status_code, 200)
+        with app.app_context():
+            self.assertEqual(menu_version(), 1)
+            self.assertEqual(MenuVersion.query.count(), 1)
+
+
+class MenuCacheTestCase(CoffeeShopTestCase):
+    """This class represents the menu ETag and conditional GET test case"""
+
+    def etag(self, url='/drinks', **kwargs):
+        res = self.client().get(url, **kwargs)
+        self.assertEqual(res.status_code, 200)
+        return res.headers['ETag']
+
+    def stats(self):
+        return self.client().get('/menu/stats').get_json()
+
+    def test_304_for_current_etag(self):
+        etag = self.etag()
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+        self.assertEqual(res.headers['ETag'], etag)
+        self.assertEqual(self.client().get('/drinks', headers={'If-None-Match': '"drinks-0-stale"'}).status_code, 200)
+
+    def test_writes_bump_the_version_and_change_the_etag(self):
+        recipe = [{'name': 'milk', 'color': 'white', 'parts': 1}]
+        water_id = self.water_id()
+        writes = [
+            lambda: self.client().post('/drinks', json={'title': 'Milk', 'recipe': recipe},
+                                       headers=self.headers('post:drinks')),
+            lambda: self.client().patch('/drinks/%d' % water_id, json={'title': 'Still Water'},
+                                        headers=self.headers('patch:drinks')),
+            lambda: self.client().delete('/drinks/%d' % water_id, headers=self.headers('delete:drinks')),
+        ]
+        etags = [self.etag()]
+        for version, write in enumerate(writes, 1):
+            self.assertEqual(write().status_code, 200)
+            with app.app_context():
+                self.assertEqual(menu_version(), version)
+            self.assertEqual(self.client().get('/drinks', headers={'If-None-Match': etags[-1]}).status_code, 200)
+            etags.append(self.etag())
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_401_before_304_on_drinks_detail(self):
+        etag = self.etag('/drinks-detail', headers=self.headers('get:drinks-detail'))
+        res = self.client().get('/drinks-detail', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 401)
+        self.assertNotIn('ETag', res.headers)
+        headers = self.headers('get:drinks-detail')
+        headers['If-None-Match'] = etag
+        self.assertEqual(self.client().get('/drinks-detail', headers=headers).status_code, 304)
+
+    def test_cache_control(self):
+        self.assertEqual(self.client().get('/drinks').headers['Cache-Control'], 'no-cache')
+        res = self.client().get('/drinks-detail', headers=self.headers('get:drinks-detail'))
+        self.assertEqual(res.headers['Cache-Control'], 'private, no-cache')
+
+    def test_stats_count_builds_hits_and_304s(self):
+        before = self.stats()
+        etag = self.etag()
+        self.client().get('/drinks')
+        self.client().get('/drinks', headers={'If-None-Match': etag})
+        after = self.stats()
+
+        self.assertEqual(after['builds'] - before['builds'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 2)
+        self.assertEqual(after['not_modified'] - before['not_modified'], 1)
+        self.assertEqual(after['versions'], {'drinks': 0})
+
+
+class AuthErrorTestCase(unittest.TestCase):
+    """This class represents the coffee shop auth error test case"""
+
+    def setUp(self):
+        self.original = verifier.settings
+        self.server = StubJWKSServer(ISSUER)
+        ISSUER.configure(verifier, keys=self.server.jwks_cache())
+        self.client = app.test_client
+
+    def tearDown(self):
+        verifier.settings = self.original
+        self.server.close()
+
+    def get_drinks_detail(self):
+        headers = {'Authorization': 'Bearer ' + ISSUER.token(permissions=('get:drinks-detail',))}
+        return self.client().get('/drinks-detail', headers=headers)
+
+    def test_401_without_token(self):
+        res = self.client().get('/drinks-detail')
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(data['error'], 401)
+        self.assertEqual(data['message']['code'], 'authorization_header_missing')
+
+    def test_503_signing_keys_unavailable(self):
+        self.server.down = True
+        res = self.get_drinks_detail()
+        data = res.get_json()
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['error'], 503)
+        self.assertEqual(data['message']['code'], 'jwks_unavailable')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,8 @@ import babel
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from models import setup_db, Movie, Actor
-from auth import AuthError, requires_auth
+from models import setup_db, Movie, Actor, load_actors, load_movies
+from auth import AuthError, requires_auth, verifier
 
 def create_app(test_config=None):
     # create and configure the app
@@ -39,7 +39,7 @@ def create_app(test_config=None):
     def get_movies(jwt):
 
         try:
-            movies = Movie.query.all()
+            movies = load_actors(Movie.query.order_by(Movie.id).all())
 
             movies_format = [movie.format() for movie in movies]
 
@@ -56,7 +56,7 @@ def create_app(test_config=None):
     def get_actors(jwt):
 
         try:
-            actors = Actor.query.all()
+            actors = load_movies(Actor.query.order_by(Actor.id).all())
 
             actors_format = [actor.format() for actor in actors]
 
@@ -220,6 +220,10 @@ def create_app(test_config=None):
             abort(422)
 
 
+    @app.route('/auth/stats')
+    def auth_stats():
+        return jsonify(dict(verifier.stats(), success=True))
+
     @app.errorhandler(AuthError)
     def unauthorized(error):
         return (
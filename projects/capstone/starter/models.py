@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import func, Column, String, Integer, Date, create_engine
+from sqlalchemy.orm.attributes import set_committed_value
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -13,8 +14,8 @@ def setup_db(app):
 
 actorsmovies = db.Table(
     'ActorsMovies',
-    db.Column('movie_id', db.Integer, db.ForeignKey('movie.id')),
-    db.Column('actor_id', db.Integer, db.ForeignKey('actor.id'))
+    db.Column('movie_id', db.Integer, db.ForeignKey('movie.id'), index=True),
+    db.Column('actor_id', db.Integer, db.ForeignKey('actor.id'), index=True)
 )
 
 class Movie(db.Model):
@@ -61,7 +62,9 @@ class Actor(db.Model):
     name = Column(String, nullable=False)
     age = Column(Integer, nullable=False)
     gender = Column(String, nullable=False)
-    movies = db.relationship('Movie', secondary=actorsmovies, backref=db.backref('actors', lazy='True'))
+    # single rows load lazily; lists go through load_actors / load_movies
+    movies = db.relationship('Movie', secondary=actorsmovies, lazy='select',
+                             backref=db.backref('actors', lazy='select'))
 
 
     def __init__(self, name, age, gender):
@@ -86,5 +89,52 @@ class Actor(db.Model):
         'name': self.name,
         'age': self.age,
         'gender': self.gender,
-        'movies': [movie.format_wo_actors() for movies in self.movies]
+        'movies': [movie.format_wo_actors() for movie in self.movies]
       }
+
+'''
+load_actors(movies), load_movies(actors)
+    eager loading for lists: one query over ActorsMovies, joined to the
+    other side, fills the relationship of every given row, so format()
+    runs without a query per row. selectinload would do the same in one
+    query per 500 rows; these take one query however long the list is.
+
+    Movie.format also lists the movies of each of its actors, so
+    load_actors reads every link of those actors and fills both sides;
+    only movies missing from the given list take a second query.
+'''
+def load_related(rows, relationship, own_column, other, other_column):
+    related = {row.id: [] for row in rows}
+    if related:
+        links = db.session.query(own_column, other).select_from(actorsmovies).join(
+            other, other.id == other_column).filter(own_column.in_(list(related))).order_by(own_column, other.id)
+        for row_id, item in links:
+            related[row_id].append(item)
+    for row in rows:
+        set_committed_value(row, relationship, related[row.id])
+    return rows
+
+def load_actors(movies):
+    cast = {movie.id: [] for movie in movies}
+    filmographies = {}
+    if cast:
+        actor_ids = db.session.query(actorsmovies.c.actor_id).filter(actorsmovies.c.movie_id.in_(list(cast)))
+        links = db.session.query(actorsmovies.c.movie_id, Actor).select_from(actorsmovies).join(
+            Actor, Actor.id == actorsmovies.c.actor_id).filter(
+            actorsmovies.c.actor_id.in_(actor_ids.subquery())).order_by(Actor.id, actorsmovies.c.movie_id)
+        for movie_id, actor in links:
+            filmographies.setdefault(actor, []).append(movie_id)
+            if movie_id in cast:
+                cast[movie_id].append(actor)
+    known = {movie.id: movie for movie in movies}
+    missing = {movie_id for movie_ids in filmographies.values() for movie_id in movie_ids} - set(known)
+    if missing:
+        known.update((movie.id, movie) for movie in Movie.query.filter(Movie.id.in_(list(missing))))
+    for movie in movies:
+        set_committed_value(movie, 'actors', cast[movie.id])
+    for actor, movie_ids in filmographies.items():
+        set_committed_value(actor, 'movies', [known[movie_id] for movie_id in movie_ids])
+    return movies
+
+def load_movies(actors):
+    return load_related(actors, 'movies', actorsmovies.c.actor_id, Movie, actorsmovies.c.movie_id)
@@ -0,0 +1,72 @@
+import os
+import unittest
+
+from flask import Flask, jsonify
+
+os.environ.setdefault('AUTH0_DOMAIN', 'casting.test')
+os.environ.setdefault('ALGORITHMS', "['RS256']")
+os.environ.setdefault('API_AUDIENCE', 'Casting')
+
+import auth
+from fsnd_auth import JWKSCache
+from fsnd_auth.testing import TestIssuer
+
+# the verifier, caches and permission checks are tested in fsnd_auth itself;
+# these tests cover how the capstone wires them up
+ISSUER = TestIssuer('RS256', domain=auth.AUTH0_DOMAIN, audience=auth.API_AUDIENCE)
+
+
+class AuthTestCase(unittest.TestCase):
+    """This class represents the capstone auth wiring test case"""
+
+    def setUp(self):
+        self.original = auth.verifier.settings
+        ISSUER.configure(auth.verifier)
+
+        app = Flask(__name__)
+
+        @app.route('/movies')
+        @auth.requires_auth('get:movies')
+        def movies(payload):
+            return jsonify({'success': True, 'sub': payload['sub']})
+
+        @app.errorhandler(auth.AuthError)
+        def unauthorized(error):
+            return jsonify({'success': False, 'message': error.error}), error.status_code
+
+        self.client = app.test_client
+
+    def tearDown(self):
+        auth.verifier.settings = self.original
+
+    def get(self, *permissions):
+        headers = {'Authorization': 'Bearer ' + ISSUER.token(permissions=permissions)}
+        return self.client().get('/movies', headers=headers)
+
+    def test_configured_from_env(self):
+        settings = self.original
+        self.assertEqual(settings.issuer, 'https://' + os.environ['AUTH0_DOMAIN'] + '/')
+        self.assertEqual(settings.algorithms, ['RS256'])
+        self.assertIsInstance(settings.keys, JWKSCache)
+        self.assertTrue(settings.keys.url.endswith('/.well-known/jwks.json'))
+
+    def test_200_permission_granted(self):
+        res = self.get('get:movies')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['sub'], 'auth0|test')
+
+    def test_401_permission_missing(self):
+        res = self.get('get:actors')
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res.get_json()['message']['code'], 'unauthorized')
+
+    def test_module_functions_share_verifier(self):
+        token = ISSUER.token(permissions=('get:movies',))
+        self.assertEqual(auth.verify_decode_jwt(token)['aud'], auth.API_AUDIENCE)
+        self.assertIs(auth.verify_token(token).payload, auth.verify_decode_jwt(token))
+        self.assertEqual(auth.verifier.stats()['tokens']['hits'], 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
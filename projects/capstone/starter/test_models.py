@@ -0,0 +1,92 @@
+import os
+import unittest
+from datetime import date
+
+from flask_sqlalchemy import get_debug_queries
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('AUTH0_DOMAIN', 'casting.test')
+os.environ.setdefault('ALGORITHMS', "['RS256']")
+os.environ.setdefault('API_AUDIENCE', 'Casting')
+
+import auth
+from app import create_app
+from models import db, Movie, Actor, actorsmovies
+from fsnd_auth.testing import TestIssuer
+
+ISSUER = TestIssuer('RS256', domain=auth.AUTH0_DOMAIN, audience=auth.API_AUDIENCE)
+MOVIES = 10000
+ACTORS = 500
+
+
+class ListSerializationTestCase(unittest.TestCase):
+    """This class represents the movie and actor list test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.original = auth.verifier.settings
+        ISSUER.configure(auth.verifier)
+        cls.app = create_app()
+        with cls.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.execute(Actor.__table__.insert(), [
+                {'id': n, 'name': 'Actor %d' % n, 'age': 20 + n % 50, 'gender': 'F' if n % 2 else 'M'}
+                for n in range(1, ACTORS + 1)])
+            db.session.execute(Movie.__table__.insert(), [
+                {'id': n, 'title': 'Movie %d' % n, 'release_date': date(2000 + n % 20, 1, 1)}
+                for n in range(1, MOVIES + 1)])
+            # every movie has two actors, every third movie has none
+            db.session.execute(actorsmovies.insert(), [
+                {'movie_id': n, 'actor_id': 1 + (n + k) % ACTORS}
+                for n in range(1, MOVIES + 1) if n % 3 for k in (0, 7)])
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.drop_all()
+        auth.verifier.settings = cls.original
+
+    def get(self, url, permission):
+        headers = {'Authorization': 'Bearer ' + ISSUER.token(permissions=(permission,))}
+        # the app runs in debug mode, so Flask-SQLAlchemy records the request's
+        # queries; the with block keeps its context around to read them
+        with self.app.test_client() as client:
+            res = client.get(url, headers=headers)
+            queries = len(get_debug_queries())
+        self.assertEqual(res.status_code, 200)
+        return res.get_json(), queries
+
+    def test_get_movies_query_count(self):
+        data, queries = self.get('/movies', 'get:movies')
+        self.assertEqual(len(data['movies']), MOVIES)
+        self.assertEqual(queries, 2)
+
+        movie = data['movies'][1]
+        self.assertEqual(movie['title'], 'Movie 2')
+        self.assertEqual([actor['id'] for actor in movie['actors']], [3, 10])
+        self.assertEqual(data['movies'][2]['actors'], [])
+        # every actor still lists all of their movies
+        for actor in movie['actors']:
+            self.assertIn(2, [actor_movie['id'] for actor_movie in actor['movies']])
+        with self.app.app_context():
+            lazy = Movie.query.get(2).format()
+        self.assertEqual([actor['id'] for actor in movie['actors']], [actor['id'] for actor in lazy['actors']])
+        for actor, lazy_actor in zip(movie['actors'], lazy['actors']):
+            self.assertEqual([m['id'] for m in actor['movies']], sorted(m['id'] for m in lazy_actor['movies']))
+
+    def test_get_actors_query_count(self):
+        data, queries = self.get('/actors', 'get:actors')
+        self.assertEqual(len(data['actors']), ACTORS)
+        self.assertEqual(queries, 2)
+
+        with self.app.app_context():
+            lazy = sorted(movie.id for movie in Actor.query.get(3).movies)
+        self.assertEqual([movie['id'] for movie in data['actors'][2]['movies']], lazy)
+        self.assertTrue(len(lazy))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()